@@ -0,0 +1,66 @@
+"""
+Startup benchmark
+
+Measures the time it takes a fresh interpreter to import each module of the
+analysis core and checks that none of them pull in Tk or plotting libraries.
+Batch scripts launch many short lived workers so this cost is paid per process.
+
+    python benchmarks/bench_startup.py --repeat 20
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+SOURCE = Path(__file__).resolve().parent.parent / 'src' / 's2sc'
+
+CORE = ['waveforms', 'tuning', 'matrices', 'wav2wt', 'wtmaker']
+
+# modules the core must not import at load time
+FORBIDDEN = ['tkinter', 'matplotlib', 'pandas', 'scipy.interpolate', 'scipy.io', 'scipy.signal', 'soundfile']
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+loaded = [m for m in {forbidden!r} if m in sys.modules]
+print(elapsed, ','.join(loaded))
+"""
+
+
+def import_time(module, repeat):
+    times = []
+    loaded = ''
+    for _ in range(repeat):
+        code = PROBE.format(module=module, forbidden=FORBIDDEN)
+        out = subprocess.run([sys.executable, '-c', code], cwd=SOURCE,
+                             capture_output=True, text=True, check=True).stdout.split(' ', 1)
+        times.append(float(out[0]))
+        loaded = out[1].strip()
+    return times, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time of the s2sc analysis core")
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--budget', type=float, default=None,
+                        help="fail if any module's median import time exceeds this many milliseconds")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'module':<12}{'median ms':>12}{'min ms':>10}  heavy imports")
+    for module in CORE:
+        times, loaded = import_time(module, args.repeat)
+        median = 1000 * statistics.median(times)
+        print(f"{module:<12}{median:>12.1f}{1000 * min(times):>10.1f}  {loaded or '-'}")
+
+        if loaded or (args.budget is not None and median > args.budget):
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
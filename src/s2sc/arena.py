@@ -0,0 +1,143 @@
+"""
+Audio arena
+
+Stores the analysis data of many files in a few shared arrays instead of one
+Audio object (with its own arrays and __dict__) per file:
+
+- all trimmed samples in one contiguous float32 arena with an offset table
+- all zero crossings as int32 ragged arrays with offset tables
+- per file scalars (srate, freq, selected indices, ...) as columns
+
+AudioView is a __slots__ view of one file that provides the regular Audio methods,
+so views can be used anywhere a list of Audio is expected.
+The columns can also be used directly for batch numpy operations across files.
+"""
+import numpy as np
+
+import wtmaker as WT
+
+
+class RaggedArray:
+    """Growable concatenation of 1d arrays, row i is data[offsets[i]:offsets[i + 1]]"""
+
+    def __init__(self, dtype, capacity = 0):
+        self.data = np.empty(capacity, dtype = dtype)
+        self.offsets = [0]
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def append(self, arr):
+        start = self.offsets[-1]
+        end = start + arr.shape[0]
+        if end > self.data.shape[0]:
+            # grow geometrically so appending n rows copies O(total) data
+            grown = np.empty(max(end, 2 * self.data.shape[0]), dtype = self.data.dtype)
+            grown[:start] = self.data[:start]
+            self.data = grown
+        self.data[start:end] = arr
+        self.offsets.append(end)
+
+    def __getitem__(self, i):
+        return self.data[self.offsets[i]:self.offsets[i + 1]]
+
+    def lengths(self):
+        return np.diff(self.offsets)
+
+
+class AudioArena:
+    """Shared storage for a session of analyzed files"""
+
+    COLUMNS = {
+        'srate': np.int32,
+        'freq': np.float64,
+        'crossing_samples': np.int32,
+        'start_min': np.int32,
+        'start_index': np.int32,
+        'end_index': np.int32,
+    }
+
+    def __init__(self, capacity = 0):
+        self.values = RaggedArray(np.float32, capacity)
+        self.starts = RaggedArray(np.int32)
+        self.ends = RaggedArray(np.int32)
+        self.columns = {name: np.zeros(16, dtype = dtype) for name, dtype in AudioArena.COLUMNS.items()}
+        self.filenames = []
+
+    def __len__(self):
+        return len(self.filenames)
+
+    def append(self, audio):
+        """Copy an analyzed Audio into the arena and return its view"""
+        i = len(self)
+        if i == self.columns['srate'].shape[0]:
+            for name, column in self.columns.items():
+                self.columns[name] = np.concatenate([column, np.zeros_like(column)])
+
+        self.values.append(audio.values)
+        self.starts.append(audio.zero_crossing_starts)
+        self.ends.append(audio.zero_crossing_ends)
+        for name in AudioArena.COLUMNS:
+            self.columns[name][i] = getattr(audio, name)
+        self.filenames.append(audio.filename)
+        return AudioView(self, i)
+
+    def extend(self, audio_data):
+        return [self.append(a) for a in audio_data]
+
+    def column(self, name):
+        """Per file values of a scalar attribute, e.g. column('freq')"""
+        return self.columns[name][:len(self)]
+
+    def views(self):
+        return [AudioView(self, i) for i in range(len(self))]
+
+    def __getitem__(self, i):
+        return AudioView(self, i)
+
+    def nbytes(self):
+        return (self.values.data.nbytes + self.starts.data.nbytes + self.ends.data.nbytes
+                + sum(c.nbytes for c in self.columns.values()))
+
+
+def column_property(name):
+    def get(self):
+        return self.arena.columns[name][self.index].item()
+
+    def set(self, value):
+        self.arena.columns[name][self.index] = value
+
+    return property(get, set)
+
+
+class AudioView(WT.AudioMethods):
+    """A single file of an AudioArena with the methods of Audio"""
+
+    __slots__ = ('arena', 'index')
+
+    def __init__(self, arena, index):
+        self.arena = arena
+        self.index = index
+
+    srate = column_property('srate')
+    freq = column_property('freq')
+    crossing_samples = column_property('crossing_samples')
+    start_min = column_property('start_min')
+    start_index = column_property('start_index')
+    end_index = column_property('end_index')
+
+    @property
+    def values(self):
+        return self.arena.values[self.index]
+
+    @property
+    def zero_crossing_starts(self):
+        return self.arena.starts[self.index]
+
+    @property
+    def zero_crossing_ends(self):
+        return self.arena.ends[self.index]
+
+    @property
+    def filename(self):
+        return self.arena.filenames[self.index]
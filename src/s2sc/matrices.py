@@ -15,14 +15,70 @@ def cmatrix(samples, srate, freqs, phase =0 ):
     for the discrete customized transform process.
 
     Consider cmatrix, matrix to be interchangeable terms.
+
+    freqs can be any grid from the tuning module, all rows are built in one
+    broadcast instead of one sinusoid per frequency.
+    """
+    x = W.sample_input(samples, srate)
+    freqs = np.asarray(freqs, dtype = np.float64)
+    return W.complex_sinusoid(x[np.newaxis, :], freqs[:, np.newaxis], phase)
+
+
+class Basis:
     """
+    A cmatrix that grows on demand.
+
+    The rows are fixed by freqs, new columns are appended whenever
+    a signal longer than the current matrix needs to be transformed.
+    Growth is geometric so a library of increasing lengths only
+    rebuilds the matrix a handful of times.
+    """
+
+    def __init__(self, srate, freqs, samples = 0):
+        self.srate = srate
+        self.freqs = np.asarray(freqs)
+        self.matrix = cmatrix(samples, srate, self.freqs)
+
+    def samples(self):
+        return self.matrix.shape[1]
+
+    def get(self, samples):
+        """
+        Get a cmatrix with at least the requested number of samples (columns)
+        """
+        current = self.samples()
+        if samples > current:
+            size = max(samples, int(1.5 * current))
+            x = np.arange(current, size) / self.srate
+            waves = W.complex_sinusoid(x[np.newaxis, :], self.freqs[:, np.newaxis])
+            self.matrix = np.concatenate([self.matrix, waves], axis = 1)
+        return self.matrix
+
+
+def decimation_factor(srate, freqs, margin = 1.25):
+    """
+    Largest integer factor that keeps the highest grid frequency (times margin,
+    room for the upper partials near the top of the grid) below the Nyquist
+    frequency of the reduced rate.
+    """
+    return max(1, int(srate // (2 * np.max(freqs) * margin)))
+
+
+def decimated_length(samples, factor):
+    return -(-samples // factor)
 
-    waves = []
 
-    for f in freqs:
-        waves.append(W.complex_sinusoid_s(samples, srate,f, phase))
+def decimate(signal, factor):
+    """
+    Anti-aliased polyphase decimation by an integer factor.
+    Output length is decimated_length(len(signal), factor).
+    """
+    if factor <= 1:
+        return signal
 
-    return np.array(waves)
+    # scipy.signal is imported on first use to keep the core quick to import
+    from scipy.signal import resample_poly
+    return resample_poly(np.asarray(signal, dtype = np.float64), 1, factor)
 
 
 def cdft_coeff(cmatrix,signal, **kwargs):
@@ -64,50 +120,144 @@ def cdft(cmatrix,signal, **kwargs):
     return output
 
 
+def frame_signal(signal, window, hop):
+    """
+    Overlapping windows of signal as a strided (n_windows, window) view, nothing is copied
+    """
+    return np.lib.stride_tricks.sliding_window_view(signal, window)[::hop]
+
+
+def short_time_cdft(cmatrix, signal, window, hop):
+    """
+    cdft amplitudes of every window of signal, shape (n_windows, n_freqs)
+
+    All windows are transformed with a single matrix product against the
+    first window columns of the cmatrix. With hop = window / 2 this costs about
+    twice a single full length cdft.
+    """
+    frames = frame_signal(signal, window, hop)
+    coeff = np.dot(frames, cmatrix[:, :window].T)
+    return np.abs(coeff) / window
+
+
 def get_freq(cdft_amplitude, freqs):
     assert(cdft_amplitude.shape == freqs.shape)
     return freqs[np.argmax(cdft_amplitude)]
 
 
-"""
-for reference encase I need something more complicated
-than get_freq
-I believe the idea for this was to sum all of the energy 
-into different peaks
-"""
-# def dct_concentration(dctamp, octsize = 12):
-#     maxind = 0
-#     total = 0
-#     output =  np.zeros(dctamp.shape)
-#     truemax = np.argmax(dctamp) - 2 * octsize
+def get_peaks(arr):
+    """
+    naive peak finding for a smooth signal
+    meant to be used specifically with the results of cdft
 
-#     for i in range(1, len(dctamp)-1):
-#         if (dctamp[i-1] < dctamp[i] and dctamp[i] > dctamp[i+1]) :
-#             maxind = i
+    Works on a single spectrum or a batch of spectra along the last axis.
+    Endpoints count as peaks when they are larger than their only neighbor.
+    """
+    arr = np.asarray(arr)
+    output = np.zeros(arr.shape)
 
-#         if dctamp[i-1] > dctamp[i] and dctamp[i] < dctamp[i+1] and i >= truemax:
-#             output[maxind] = total
-#             total = 0
-#             maxind = 0
-#         else:
-#             total += dctamp[i]
+    if arr.shape[-1] < 2:
+        return output
 
-#     return output
+    mid = arr[..., 1:-1]
+    output[..., 1:-1] = (arr[..., :-2] < mid) & (mid > arr[..., 2:])
+    output[..., 0] = arr[..., 0] > arr[..., 1]
+    output[..., -1] = arr[..., -1] > arr[..., -2]
 
+    #this method also assumes a smooth signal
+    return output
 
-def get_peaks(arr):
-    # naive peak finding for a smooth signal
-    # meant to be used specifically with the results of cft.matrix
-    output = np.zeros(arr.shape[0])
-    for i in range(1,arr.shape[0]-1):
-        output[i] = 1 if arr[i-1] < arr[i] > arr[i+1] else 0
 
-    if arr[0] > arr[1]:
-        output[0] =1
+def harmonic_offsets(harmonics = 5, octsize = 12):
+    """
+    Row offsets of harmonics 1..harmonics on an equal tempered frequency grid
+    with octsize steps per octave. e.g. 12 steps: [0, 12, 19, 24, 28]
+    """
+    h = np.arange(1, harmonics + 1)
+    return np.round(octsize * np.log2(h)).astype(int)
 
-    end = len(arr) -1
-    if arr[end] < arr[end - 1]:
-        output[end] = 0
 
-    #this method also assumes a smooth signal
-    return output
\ No newline at end of file
+def harmonic_sum(cdft_amplitude, harmonics = 5, octsize = 12, weights = None):
+    """
+    Sum the energy of each grid frequency with the energy of its harmonics.
+
+    score[i] = sum_h weights[h] * amplitude[i + offset[h]]
+
+    The idea is to concentrate the energy of a note into its fundamental
+    so that a strong second harmonic does not win the pick.
+    Harmonics past the top of the grid contribute nothing.
+    weights default to 1/sqrt(h), decreasing so a candidate's own amplitude counts
+    the most, but slowly enough that a weak fundamental under a strong second
+    harmonic still outscores the octave above it.
+    """
+    amp = np.asarray(cdft_amplitude)
+    offsets = harmonic_offsets(harmonics, octsize)
+    if weights is None:
+        weights = 1 / np.sqrt(np.arange(1, harmonics + 1))
+
+    n = amp.shape[-1]
+    padded = np.zeros(amp.shape[:-1] + (n + offsets[-1],))
+    padded[..., :n] = amp
+
+    output = np.zeros(amp.shape)
+    for o, w in zip(offsets, weights):
+        output += w * padded[..., o:o + n]
+    return output
+
+
+def harmonic_product(cdft_amplitude, harmonics = 5, octsize = 12, eps = 1e-12):
+    """
+    Harmonic product spectrum over the cdft amplitudes.
+
+    Computed as the mean log amplitude of the harmonics (the log of the geometric mean)
+    so long products do not underflow.
+    Harmonics past the top of the grid count as the quietest amplitude of the spectrum
+    instead of being left out of the mean, otherwise a candidate near the top would
+    average only its few strong partials and win over the real fundamental.
+    """
+    amp = np.asarray(cdft_amplitude)
+    offsets = harmonic_offsets(harmonics, octsize)
+
+    n = amp.shape[-1]
+    logs = np.log(amp + eps)
+    padded = np.empty(amp.shape[:-1] + (n + offsets[-1],))
+    padded[..., :n] = logs
+    padded[..., n:] = np.min(logs, axis = -1, keepdims = True)
+
+    total = np.zeros(amp.shape)
+    for o in offsets:
+        total += padded[..., o:o + n]
+    return total / len(offsets)
+
+
+def get_harmonic_freq(cdft_amplitude, freqs, method = 'sum', harmonics = 5, octsize = 12, floor = 0.1):
+    """
+    Pick the frequency with the highest harmonic score among the candidates.
+
+    Candidates are spectral peaks whose own amplitude is at least floor times the
+    largest amplitude of the spectrum. Without that gate a leakage sidelobe at f/3 or f/5
+    collects the full amplitude of the real fundamental through its harmonics.
+    Spectra without a candidate fall back to the plain argmax.
+
+    cdft_amplitude can be a single spectrum or a batch (n_signals, n_freqs),
+    the result is a frequency or an array of frequencies respectively.
+    """
+    amp = np.asarray(cdft_amplitude)
+    freqs = np.asarray(freqs)
+    assert(amp.shape[-1] == freqs.shape[-1])
+
+    if method == 'sum':
+        score = harmonic_sum(amp, harmonics, octsize)
+    elif method == 'product':
+        score = harmonic_product(amp, harmonics, octsize)
+    else:
+        raise ValueError(f"unknown harmonic scoring method: {method}")
+
+    # only consider strong local maxima of the raw spectrum as fundamentals
+    candidates = get_peaks(amp).astype(bool)
+    candidates &= amp >= floor * np.max(amp, axis = -1, keepdims = True)
+    score = np.where(candidates, score, -np.inf)
+
+    picks = np.argmax(score, axis = -1)
+    picks = np.where(candidates.any(axis = -1), picks, np.argmax(amp, axis = -1))
+    return freqs[picks]
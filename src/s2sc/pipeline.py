@@ -0,0 +1,79 @@
+"""
+Pipelined loading
+
+Decoding runs in a background thread that fills a bounded prefetch queue
+while the caller analyzes the previous file (zero crossings and cdft).
+File reads and the large numpy operations release the GIL, so loading takes
+roughly max(I/O, compute) instead of their sum.
+
+The basis grows on demand (matrices.Basis, see Audio.analyze) instead of waiting for the
+longest file to be known.
+"""
+import wtmaker as WT
+
+import queue
+import threading
+
+DONE = object()
+
+
+def put(q, item, stop):
+    # blocking put that gives up once the consumer has stopped
+    while not stop.is_set():
+        try:
+            q.put(item, timeout = 0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def decode_files(paths, q, stop):
+    for p in paths:
+        try:
+            item = (p, WT.read_wav(p), None)
+        except Exception as e:
+            item = (p, None, e)
+        if not put(q, item, stop):
+            return
+    put(q, DONE, stop)
+
+
+def load_audio(paths, freqs, prefetch = 4, bases = None):
+    """
+    Generator of analyzed Audio, one per path and in path order.
+
+    Decoding of the next files overlaps with the analysis of the current one.
+    bases maps (srate, decimation) -> matrices.Basis and can be passed in to keep the basis
+    warm between loads. Decoding errors are raised when the failed file is reached.
+    """
+    if bases is None:
+        bases = {}
+
+    q = queue.Queue(maxsize = max(prefetch, 1))
+    stop = threading.Event()
+    reader = threading.Thread(target = decode_files, args = (paths, q, stop), daemon = True)
+    reader.start()
+
+    try:
+        while True:
+            item = q.get()
+            if item is DONE:
+                break
+
+            path, data, error = item
+            if error is not None:
+                raise error
+
+            srate, values = data
+            a = WT.Audio(srate, values, path)
+
+            a.analyze(bases, freqs)
+            # the end starts one period after the start, the gui keeps whatever end it is given
+            a.find_nearest_period_end()
+
+            yield a
+    finally:
+        # unblocks the reader if the consumer stopped early
+        stop.set()
+        reader.join()
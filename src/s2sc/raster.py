@@ -0,0 +1,98 @@
+"""
+Raster waveform rendering
+
+Builds waveform images as numpy RGB buffers that can be shown with a single
+tk.PhotoImage instead of thousands of canvas line items.
+Only numpy is needed here, Tk is handled by wtgui.
+"""
+import numpy as np
+
+BACKGROUND = (255, 255, 255)
+WAVEFORM = (0, 0, 0)
+CENTER = (128, 128, 128)
+START = (0, 128, 0)
+END = (255, 0, 0)
+
+MARKER_WIDTH = 2
+
+
+def column_envelope(values, width):
+    """
+    Min and max of the samples that fall into each of width pixel columns.
+    Each column is extended to the last sample of the previous column so the trace stays connected.
+    """
+    n = values.shape[0]
+    starts = (np.arange(width) * n) // width
+
+    if n >= width:
+        lo = np.minimum.reduceat(values, starts)
+        hi = np.maximum.reduceat(values, starts)
+    else:
+        # fewer samples than columns, repeat samples across columns
+        lo = values[starts]
+        hi = lo.copy()
+
+    prev_last = values[np.maximum(starts - 1, 0)]
+    return np.minimum(lo, prev_last), np.maximum(hi, prev_last)
+
+
+def render_waveform(values, width, height):
+    """
+    (height, width, 3) uint8 image of the waveform envelope and a dashed center line.
+    Uses the same scaling as the canvas line renderer in wtgui.
+    """
+    buffer = np.empty((height, width, 3), dtype = np.uint8)
+    buffer[:] = BACKGROUND
+
+    values = np.asarray(values, dtype = np.float64)
+    if values.shape[0] == 0 or width <= 0:
+        return buffer
+
+    peak = np.max(np.abs(values))
+    if peak > 0:
+        values = values / peak
+
+    y_center = height // 2
+    y_scale = (height - 20) // 2
+
+    # dashed center line, 2 pixels on 2 pixels off
+    dash = (np.arange(width) // 2) % 2 == 0
+    buffer[y_center, dash] = CENTER
+
+    lo, hi = column_envelope(values, width)
+    top = np.clip(np.round(y_center - hi * y_scale), 0, height - 1).astype(int)
+    bottom = np.clip(np.round(y_center - lo * y_scale), 0, height - 1).astype(int)
+
+    rows = np.arange(height)[:, np.newaxis]
+    buffer[(rows >= top) & (rows <= bottom)] = WAVEFORM
+    return buffer
+
+
+def marker_columns(x, width):
+    """Column range [x0, x1) covered by a vertical marker centered on pixel x"""
+    x0 = int(np.clip(round(x) - MARKER_WIDTH // 2, 0, width))
+    x1 = int(np.clip(x0 + MARKER_WIDTH, 0, width))
+    return x0, x1
+
+
+def draw_marker(buffer, x, color):
+    x0, x1 = marker_columns(x, buffer.shape[1])
+    buffer[:, x0:x1] = color
+    return x0, x1
+
+
+def to_ppm(buffer):
+    """Binary PPM (P6) bytes accepted by tk.PhotoImage(data=...)"""
+    height, width, _ = buffer.shape
+    return f"P6 {width} {height} 255\n".encode() + np.ascontiguousarray(buffer).tobytes()
+
+
+def to_put_data(buffer):
+    """
+    Tk color list for PhotoImage.put, used to patch a few columns without re-encoding the image.
+    e.g. '{#ffffff #000000} {#ffffff #000000}'
+    """
+    hexed = np.char.mod('#%06x', (buffer[..., 0].astype(np.int32) << 16)
+                        | (buffer[..., 1].astype(np.int32) << 8)
+                        | buffer[..., 2].astype(np.int32))
+    return ' '.join('{' + ' '.join(row) + '}' for row in hexed)
@@ -0,0 +1,100 @@
+"""
+Frame reduction
+
+Reduces a (n_frames, frame_size) wavetable matrix to a target number of frames
+by merging the most similar neighbouring frames. Similarity is measured on
+normalized rfft magnitudes so the phase of each cycle does not matter.
+
+Only adjacent frames are merged, so the note order of the table is preserved.
+"""
+import numpy as np
+
+
+def frame_spectra(frames):
+    """Unit length rfft magnitudes of every frame (row)"""
+    mag = np.abs(np.fft.rfft(frames, axis = 1))
+    norm = np.linalg.norm(mag, axis = 1, keepdims = True)
+    return mag / np.maximum(norm, 1e-12)
+
+
+def adjacent_groups(spectra, target):
+    """
+    Agglomerative clustering restricted to neighbouring rows.
+
+    Each step merges the adjacent pair of groups with the lowest Ward cost
+    (size weighted squared distance between group centroids) until target groups remain.
+    Returns a list of (start, end) row ranges in order.
+    """
+    n = spectra.shape[0]
+    target = max(int(target), 1)
+
+    centroids = spectra.astype(np.float64)
+    counts = np.ones(n)
+    ends = np.arange(1, n + 1)
+    nxt = np.arange(1, n + 1)   # next group start, n marks the end of the table
+    prev = np.arange(-1, n - 1)
+    alive = np.ones(n, dtype = bool)
+
+    def ward(i, j):
+        d = centroids[i] - centroids[j]
+        return counts[i] * counts[j] / (counts[i] + counts[j]) * np.dot(d, d)
+
+    # cost[i] is the cost of merging group i with the group after it
+    cost = np.full(n, np.inf)
+    diff = centroids[1:] - centroids[:-1]
+    cost[:-1] = 0.5 * np.einsum('ij,ij->i', diff, diff)
+
+    for _ in range(n - target):
+        i = int(np.argmin(cost))
+        j = nxt[i]
+
+        total = counts[i] + counts[j]
+        centroids[i] = (counts[i] * centroids[i] + counts[j] * centroids[j]) / total
+        counts[i] = total
+        ends[i] = ends[j]
+
+        alive[j] = False
+        cost[j] = np.inf
+        nxt[i] = nxt[j]
+        if nxt[i] < n:
+            prev[nxt[i]] = i
+
+        cost[i] = ward(i, nxt[i]) if nxt[i] < n else np.inf
+        if prev[i] >= 0:
+            cost[prev[i]] = ward(prev[i], i)
+
+    starts = np.flatnonzero(alive)
+    return list(zip(starts, ends[starts]))
+
+
+def reduce_frames(frames, target, merge = 'representative'):
+    """
+    Reduce frames to at most target rows while keeping their order.
+
+    merge='representative' keeps the member of each group closest to the group's
+    average spectrum, so every frame in the result is a real cycle.
+    merge='mean' averages the members of each group in the time domain and
+    rescales the result to the loudest member.
+    """
+    frames = np.asarray(frames)
+    if target is None or frames.shape[0] <= target:
+        return frames
+
+    spectra = frame_spectra(frames)
+    groups = adjacent_groups(spectra, target)
+
+    output = []
+    for start, end in groups:
+        members = frames[start:end]
+        if merge == 'representative':
+            s = spectra[start:end]
+            error = np.linalg.norm(s - s.mean(axis = 0), axis = 1)
+            output.append(members[np.argmin(error)])
+        elif merge == 'mean':
+            frame = members.mean(axis = 0)
+            peak = np.max(np.abs(members))
+            output.append(peak * frame / max(np.max(np.abs(frame)), 1e-12))
+        else:
+            raise ValueError(f"unknown merge method: {merge}")
+
+    return np.array(output)
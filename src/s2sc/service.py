@@ -0,0 +1,249 @@
+"""
+Conversion service
+
+A local HTTP/JSON server that converts folders or uploaded .wav files into
+wavetables without starting Tk. Analysis runs in a persistent process pool;
+every worker keeps its basis (matrices.Basis) warm between requests so the
+interpreter start and basis build are only paid once.
+
+Run from the source directory with:
+
+    python service.py --port 8765 --workers 4
+
+Endpoints
+
+    GET  /health
+    POST /analyze   analysis results only
+    POST /convert   analysis results and written wavetable paths
+
+POST bodies are JSON with either a directory or a list of uploaded files:
+
+    {"directory": "/path/to/guitar"}
+    {"files": [{"name": "A2.wav", "data": "<base64 .wav bytes>"}]}
+
+and the options
+
+    "output": "../../output/", "name": "guitar", "frame_size": 2048,
+    "sort": true, "formats": ["wav", "wt"], "max_frames": null,
+    "cycles": 1, "combine": "mean"
+"""
+import wtmaker as WT
+import tuning as T
+
+import io
+import os
+import json
+import base64
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# per worker state, created once by init_worker and reused by every request
+worker_freqs = None
+worker_bases = {}
+
+
+def init_worker():
+    global worker_freqs
+    worker_freqs = T.get_midi_freqs()
+
+
+def worker_pid(_ = None):
+    return os.getpid()
+
+
+def analyze(name, source, frame_size, cycles = 1, combine = 'mean'):
+    """
+    Analyze one file in a worker process.
+    source is a path or the raw bytes of an uploaded .wav
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+
+    srate, values = WT.read_wav(source)
+    a = WT.Audio(srate, values, name)
+
+    a.analyze(worker_bases, worker_freqs)
+    a.find_nearest_period_end()
+
+    result = {
+        'filename': name,
+        'srate': int(srate),
+        'samples': int(a.samples()),
+        'freq': float(a.freq),
+        'note': T.get_class_label(a.freq) if a.freq > 0 else None,
+        'start': int(a.zero_crossing_start()),
+        'end': int(a.zero_crossing_end()),
+        'selected_samples': int(a.selected_samples()),
+    }
+    return result, a.create_frame(frame_size, cycles = cycles, combine = combine)
+
+
+class RequestError(Exception):
+    pass
+
+
+FORMATS = ('wav', 'wt')
+
+
+def integer_option(request, name, default, minimum = 1):
+    """Read an integer option, numeric strings are accepted, anything else is a RequestError"""
+    value = request.get(name, default)
+    if isinstance(value, bool) or isinstance(value, float) and not value.is_integer():
+        raise RequestError(f"{name} must be an integer, got {value!r}")
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise RequestError(f"{name} must be an integer, got {value!r}")
+    if value < minimum:
+        raise RequestError(f"{name} must be at least {minimum}, got {value}")
+    return value
+
+
+def string_option(request, name, default):
+    value = request.get(name, default)
+    if not isinstance(value, str) or value == '':
+        raise RequestError(f"{name} must be a non empty string, got {value!r}")
+    return value
+
+
+class Service(ThreadingHTTPServer):
+    """HTTP server owning the worker pool"""
+
+    daemon_threads = True
+
+    def __init__(self, address, workers = None):
+        super().__init__(address, Handler)
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(max_workers = self.workers, initializer = init_worker)
+        # start the workers now instead of on the first request
+        list(self.pool.map(worker_pid, range(self.workers)))
+
+    def sources(self, request):
+        if 'directory' in request:
+            directory = Path(request['directory'])
+            if not directory.is_dir():
+                raise RequestError(f"{directory} is not a directory")
+            names = sorted(f for f in os.listdir(directory) if f.endswith('.wav'))
+            return [(n, str(directory / n)) for n in names], directory.stem
+
+        if 'files' in request:
+            try:
+                files = [(f['name'], base64.b64decode(f['data'], validate = True)) for f in request['files']]
+            except (KeyError, TypeError, ValueError) as e:
+                raise RequestError(f"files must be a list of {{name, data}} with base64 data: {e}")
+            return files, 'wavetable'
+
+        raise RequestError("request needs a directory or files")
+
+    def run(self, request, write):
+        sources, default_name = self.sources(request)
+        if len(sources) == 0:
+            raise RequestError("no .wav files found")
+
+        frame_size = integer_option(request, 'frame_size', 2048)
+        cycles = integer_option(request, 'cycles', 1)
+        combine = request.get('combine', 'mean')
+        if combine not in ('mean', 'median'):
+            raise RequestError(f"unknown combine method {combine}")
+
+        # write options are checked before any analysis is queued
+        formats = request.get('formats', list(FORMATS))
+        if not isinstance(formats, list) or len(formats) == 0 or any(f not in FORMATS for f in formats):
+            raise RequestError(f"formats must be a non empty list of {list(FORMATS)}, got {formats!r}")
+        max_frames = None if request.get('max_frames') is None else integer_option(request, 'max_frames', None)
+        output = string_option(request, 'output', '../../output/')
+        table_name = string_option(request, 'name', default_name)
+
+        futures = [self.pool.submit(analyze, name, source, frame_size, cycles, combine) for name, source in sources]
+
+        results = []
+        for (name, _), future in zip(sources, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                raise RequestError(f"{name}: {e}")
+
+        if request.get('sort', True):
+            #sort to put longest samples/lowest frequency at the start of wavetable
+            results.sort(key = lambda x: x[0]['selected_samples'], reverse = True)
+
+        response = {'files': [r for r, _ in results]}
+
+        if write:
+            count, paths = WT.write_frames(
+                [frame for _, frame in results],
+                output,
+                table_name,
+                frame_size,
+                formats,
+                max_frames,
+            )
+            response['frames'] = count
+            response['outputs'] = {k: str(v.resolve()) for k, v in paths.items()}
+
+        return response
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown()
+
+
+class Handler(BaseHTTPRequestHandler):
+
+    def send_json(self, code, data):
+        body = json.dumps(data).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self.send_json(200, {'status': 'ok', 'workers': self.server.workers})
+        else:
+            self.send_json(404, {'error': f"unknown endpoint {self.path}"})
+
+    def do_POST(self):
+        if self.path not in ('/analyze', '/convert'):
+            self.send_json(404, {'error': f"unknown endpoint {self.path}"})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(request, dict):
+                raise RequestError("request body must be a JSON object")
+            response = self.server.run(request, write = self.path == '/convert')
+        except (RequestError, ValueError) as e:
+            self.send_json(400, {'error': str(e)})
+            return
+        except Exception as e:
+            self.send_json(500, {'error': str(e)})
+            return
+
+        self.send_json(200, response)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local HTTP/JSON wavetable conversion service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=None, help="worker processes, defaults to the cpu count")
+    args = parser.parse_args()
+
+    server = Service((args.host, args.port), args.workers)
+    print(f"Serving on http://{args.host}:{args.port} with {server.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Analysis sessions
+
+Saves the analysis state of every Audio (trimmed values, zero crossings, frequency,
+and the chosen start/end indices) to a single uncompressed .npz file so a session
+can be reopened without decoding or analyzing the .wav files again.
+
+Ragged arrays are stored concatenated with offset tables.
+On load the concatenated sample data is memory mapped straight out of the .npz,
+so only the pages that are actually drawn or exported are read from disk.
+"""
+import numpy as np
+
+import wtmaker as WT
+
+import struct
+import zipfile
+from pathlib import Path
+
+
+def ragged(arrays):
+    """Concatenate arrays and return (data, offsets) with offsets[i]:offsets[i+1] selecting array i"""
+    offsets = np.zeros(len(arrays) + 1, dtype = np.int64)
+    offsets[1:] = np.cumsum([a.shape[0] for a in arrays])
+    data = np.concatenate(arrays) if len(arrays) > 0 else np.zeros(0)
+    return data, offsets
+
+
+def save_session(path, audio_data):
+    """Save a list of Audio to path (.npz)"""
+    values, value_offsets = ragged([a.values for a in audio_data])
+    starts, start_offsets = ragged([a.zero_crossing_starts for a in audio_data])
+    ends, end_offsets = ragged([a.zero_crossing_ends for a in audio_data])
+
+    # np.savez stores members uncompressed, which is what allows memory mapping on load
+    np.savez(path,
+        values = values,
+        value_offsets = value_offsets,
+        starts = starts,
+        start_offsets = start_offsets,
+        ends = ends,
+        end_offsets = end_offsets,
+        srate = np.array([a.srate for a in audio_data], dtype = np.int64),
+        freq = np.array([a.freq for a in audio_data], dtype = np.float64),
+        crossing_samples = np.array([a.crossing_samples for a in audio_data], dtype = np.int64),
+        start_min = np.array([a.start_min for a in audio_data], dtype = np.int64),
+        start_index = np.array([a.start_index for a in audio_data], dtype = np.int64),
+        end_index = np.array([a.end_index for a in audio_data], dtype = np.int64),
+        filename = np.array([str(a.filename) for a in audio_data], dtype = str),
+    )
+
+
+def mmap_member(path, name):
+    """
+    Memory map an uncompressed array stored in a .npz file.
+
+    Returns None if the member is compressed and has to be read normally.
+    """
+    with zipfile.ZipFile(path) as zf:
+        info = zf.getinfo(name + '.npy')
+
+    if info.compress_type != zipfile.ZIP_STORED:
+        return None
+
+    with open(path, 'rb') as f:
+        # local file header: 30 fixed bytes, then the file name and extra field
+        f.seek(info.header_offset)
+        header = f.read(30)
+        name_length, extra_length = struct.unpack('<HH', header[26:30])
+        f.seek(info.header_offset + 30 + name_length + extra_length)
+
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+
+    if shape == (0,) or 0 in shape:
+        return np.zeros(shape, dtype = dtype)
+
+    order = 'F' if fortran_order else 'C'
+    return np.memmap(path, dtype = dtype, mode = 'r', offset = offset, shape = shape, order = order)
+
+
+def load_session(path):
+    """Load a list of Audio saved with save_session"""
+    path = Path(path)
+
+    values = mmap_member(path, 'values')
+
+    with np.load(path, allow_pickle = False) as data:
+        if values is None:
+            values = data['values']
+        value_offsets = data['value_offsets']
+        starts = data['starts']
+        start_offsets = data['start_offsets']
+        ends = data['ends']
+        end_offsets = data['end_offsets']
+        srate = data['srate']
+        freq = data['freq']
+        crossing_samples = data['crossing_samples']
+        start_min = data['start_min']
+        start_index = data['start_index']
+        end_index = data['end_index']
+        filename = data['filename']
+
+    audio_data = []
+    for i in range(srate.shape[0]):
+        a = WT.Audio.from_analysis(
+            int(srate[i]),
+            values[value_offsets[i]:value_offsets[i + 1]],
+            starts[start_offsets[i]:start_offsets[i + 1]],
+            ends[end_offsets[i]:end_offsets[i + 1]],
+            filename = str(filename[i]),
+            freq = float(freq[i]),
+            crossing_samples = int(crossing_samples[i]),
+        )
+        a.start_min = int(start_min[i])
+        a.start_index = int(start_index[i])
+        a.end_index = int(end_index[i])
+        audio_data.append(a)
+
+    return audio_data
@@ -1,37 +1,142 @@
 import numpy as np
+from functools import lru_cache
 
+CLASSES = np.array('C,Cs,D,Ds,E,F,Fs,G,Gs,A,As,B'.split(','))
+
+
+"""
+Scales are stored as tuples of frequency ratios in the same layout as a Scala file:
+(1.0, degree 1, degree 2, ..., period)
+e.g. 12 tone equal temperament is (1.0, 2**(1/12), ..., 2**(11/12), 2.0)
+"""
+
+def equal_temperament(divisions = 12, period = 2.0):
+    return tuple(float(r) for r in period ** (np.arange(divisions + 1) / divisions))
+
+
+def read_scala(filepath):
+    """
+    Read a Scala (.scl) scale file into a ratio tuple.
+
+    Pitch lines containing a '.' are in cents, everything else is a ratio (3/2) or integer (2).
+    Lines starting with '!' are comments, the first non comment line is the description.
+    """
+    with open(filepath, 'r') as f:
+        lines = [line.strip() for line in f if not line.startswith('!')]
+
+    count = int(lines[1].split()[0])
+    ratios = [1.0]
+    for line in lines[2:2 + count]:
+        value = line.split()[0]
+        if '.' in value:
+            ratios.append(2 ** (float(value) / 1200))
+        elif '/' in value:
+            num, den = value.split('/')
+            ratios.append(int(num) / int(den))
+        else:
+            ratios.append(float(int(value)))
+    return tuple(ratios)
+
+
+def get_scale_freqs(low_exp, high_exp, ref_freq = 440, scale = None):
+    """
+    Frequency grid for scale steps low_exp..high_exp relative to ref_freq (step 0).
+
+    scale is any sequence of ratios (see above), defaulting to 12 tone equal temperament.
+    The grid is cached by (range, reference, scale) and returned read only,
+    so repeated callers share one array.
+    """
+    if scale is None:
+        scale = equal_temperament()
+    # lists and arrays are not hashable, the cache needs a tuple
+    return _get_scale_freqs(low_exp, high_exp, ref_freq, tuple(float(r) for r in scale))
+
+
+@lru_cache(maxsize = None)
+def _get_scale_freqs(low_exp, high_exp, ref_freq, scale):
+
+    ratios = np.array(scale[:-1])
+    period = scale[-1]
+    steps = np.arange(low_exp, high_exp + 1)
+    octave, degree = np.divmod(steps, ratios.shape[0])
+
+    output = ref_freq * period ** octave * ratios[degree]
+    output.flags.writeable = False
+    return output
+
+
+@lru_cache(maxsize = None)
 def get_freqs(low_exp, high_exp, ref_freq = 440, semitone = 2**(1/12) ):
     # freq = fundamental * SEMITONE^exponent
-    return np.array([ref_freq * semitone ** n for n in range(low_exp, high_exp + 1)])
+    output = ref_freq * semitone ** np.arange(low_exp, high_exp + 1, dtype = np.float64)
+    output.flags.writeable = False
+    return output
 
 def get_midi_freqs():
     return get_freqs(-57, 42, 440, 2**(1/12))
 
 
-def get_note_index(freq, ref_freq=440, semitone=2**(1/12), min_exponent= -57):
+def get_equal_freqs(low_exp, high_exp, ref_freq = 440, divisions = 12):
+    return get_freqs(low_exp, high_exp, ref_freq, 2**(1/divisions))
+
+
+def get_divisions(semitone):
+    """Number of steps per octave of an equal step size, e.g. 12 for 2**(1/12)"""
+    return int(round(np.log(2) / np.log(semitone)))
+
+
+def get_note_index(freq, ref_freq=440, semitone=2**(1/12), min_exponent=None):
     # the lowest note of consideration (i.e. C0_exponent) will be considered 0
     # this can then be used to lookup values from the note table by note name of frequency
+    # freq may be a scalar or an array, the result has the same shape
+    # min_exponent defaults to C0, 57 semitones (4.75 octaves) below A4, in steps of semitone
+
+    if min_exponent is None:
+        min_exponent = int(round(-4.75 * get_divisions(semitone)))
 
     # reverse calculate_notes()
-    semitone_to_exp = freq / ref_freq
+    semitone_to_exp = np.asarray(freq) / ref_freq
+
+    output = np.floor(.5 + np.log(semitone_to_exp) / np.log(semitone) - min_exponent).astype(int)
+    return int(output) if output.ndim == 0 else output
 
-    return int(.5 + np.log(semitone_to_exp) / np.log(semitone) - min_exponent)
+
+def get_scale_index(freq, grid):
+    """
+    Index of the nearest grid frequency (in log distance) for a scalar or array of frequencies.
+    Works with any sorted grid, including get_scale_freqs of an unequal scale.
+    """
+    log_grid = np.log(grid)
+    log_freq = np.log(np.asarray(freq, dtype = np.float64))
+
+    right = np.clip(np.searchsorted(log_grid, log_freq), 1, log_grid.shape[0] - 1)
+    left = right - 1
+    output = np.where(log_freq - log_grid[left] < log_grid[right] - log_freq, left, right)
+    return int(output) if output.ndim == 0 else output
 
 # integer based pitch class
-def get_class(index):
-    classes = 'C,Cs,D,Ds,E,F,Fs,G,Gs,A,As,B'.split(',')
-    return classes[index%12]
+def get_class(index, classes = CLASSES):
+    output = classes[np.asarray(index) % len(classes)]
+    return str(output) if output.ndim == 0 else output
+
+def get_octave(index, divisions = 12):
+    output = np.asarray(index) // divisions
+    return int(output) if output.ndim == 0 else output
 
-def get_octave(index):
-    return int(index/12)
+def get_class_label(freq, ref_freq=440, semitone=2**(1/12), classes = CLASSES):
+    # classes names every step of one octave, so their count must match the step size
+    divisions = get_divisions(semitone)
+    if divisions != len(classes):
+        raise ValueError(f"{len(classes)} class names cannot label {divisions} steps per octave, pass classes for this tuning")
 
-def get_class_label(freq, ref_freq=440, semitone=2**(1/12)):
     i = get_note_index(freq, ref_freq= ref_freq, semitone = semitone )
-    c = get_class(i)
-    o = get_octave(i)
-    return c + str(o)
+    c = get_class(i, classes)
+    o = get_octave(i, divisions)
+    if np.ndim(i) == 0:
+        return c + str(o)
+    return np.char.add(c, o.astype(str))
 
 
-def oct_ind_to_freq(freqs, octave, index):
-    i = octave*12 + index
-    return freqs[i]
\ No newline at end of file
+def oct_ind_to_freq(freqs, octave, index, divisions = 12):
+    i = np.asarray(octave)*divisions + np.asarray(index)
+    return freqs[i]
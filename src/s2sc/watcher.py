@@ -0,0 +1,282 @@
+"""
+Watch folder mode
+
+Watches instrument folders of .wav files and rebuilds the wavetable of a
+folder whenever files are added, changed, or removed.
+
+Only new or changed files are analyzed again, the frames of every other
+file are reused from the cache so a rebuild costs about as much as the change.
+
+Run from the source directory with:
+
+    python watcher.py path/to/instrument1 path/to/instrument2 --output ../../output
+"""
+import wtmaker as WT
+import tuning as T
+
+import os
+import time
+import select
+import struct
+import ctypes
+import ctypes.util
+import argparse
+from pathlib import Path
+
+
+class Inotify:
+    """Minimal linux inotify wrapper that reports which watched directories changed"""
+
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+
+    MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    # struct inotify_event {int wd; uint32 mask; uint32 cookie; uint32 len; char name[len]}
+    EVENT = struct.Struct('iIII')
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches = {}
+
+    def add_watch(self, directory):
+        wd = self._add_watch(self.fd, os.fsencode(str(directory)), Inotify.MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+        self.watches[wd] = directory
+
+    def read(self, timeout):
+        """Wait up to timeout seconds and return the set of directories with events"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+
+        try:
+            buffer = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        directories = set()
+        offset = 0
+        while offset + Inotify.EVENT.size <= len(buffer):
+            wd, mask, cookie, length = Inotify.EVENT.unpack_from(buffer, offset)
+            offset += Inotify.EVENT.size + length
+            if wd in self.watches:
+                directories.add(self.watches[wd])
+        return directories
+
+    def close(self):
+        os.close(self.fd)
+
+
+class Poller:
+    """Polling fallback with the same interface as Inotify"""
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self.watches = []
+
+    def add_watch(self, directory):
+        self.watches.append(directory)
+
+    def read(self, timeout):
+        # every directory is reported as changed
+        # WatchFolder.scan decides which files actually changed
+        time.sleep(min(timeout, self.interval))
+        return set(self.watches)
+
+    def close(self):
+        pass
+
+
+def create_events(interval, polling=False):
+    if not polling:
+        try:
+            return Inotify()
+        except (OSError, AttributeError):
+            print("inotify unavailable, falling back to polling")
+    return Poller(interval)
+
+
+def file_signature(entry):
+    stat = entry.stat()
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class WatchFolder:
+    """
+    Cached analysis state of a single instrument folder.
+
+    entries maps filename -> (signature, Audio, frame).
+    A failed analysis is stored as (signature, None, None) so a broken file
+    is only retried once it changes again.
+    """
+
+    def __init__(self, input_directory, output_directory, frame_size=2048, sort=True, max_frames=None,
+                 cycles=1, combine='mean'):
+        self.input_directory = Path(input_directory)
+        self.output_directory = Path(output_directory)
+        self.filename = self.input_directory.stem
+        self.frame_size = frame_size
+        self.sort = sort
+        self.max_frames = max_frames
+        self.cycles = cycles
+        self.combine = combine
+        self.entries = {}
+
+    def scan(self, settle):
+        """
+        Compare the folder with the cache.
+
+        Returns the changed filenames, the removed filenames, and whether
+        some files were modified too recently (still being written) to be trusted.
+        """
+        now = time.time_ns()
+        changed = []
+        seen = set()
+        unsettled = False
+
+        with os.scandir(self.input_directory) as it:
+            for entry in it:
+                if not entry.name.endswith('.wav') or not entry.is_file():
+                    continue
+
+                signature = file_signature(entry)
+                if now - signature[0] < settle * 1e9:
+                    # leave the old entry in place until the file stops changing
+                    unsettled = True
+                    seen.add(entry.name)
+                    continue
+
+                seen.add(entry.name)
+                cached = self.entries.get(entry.name)
+                if cached is None or cached[0] != signature:
+                    changed.append((entry.name, signature))
+
+        removed = [name for name in self.entries if name not in seen]
+        return changed, removed, unsettled
+
+    def analyze(self, filename, signature, bases, freqs):
+        try:
+            a = WT.Audio.fromfilename(self.input_directory / filename)
+
+            a.analyze(bases, freqs)
+            a.find_nearest_period_end()
+            frame = a.create_frame(self.frame_size, cycles = self.cycles, combine = self.combine)
+        except Exception as e:
+            print(f"Skipping {self.input_directory / filename}: {e}")
+            self.entries[filename] = (signature, None, None)
+            return
+
+        self.entries[filename] = (signature, a, frame)
+        print(f"Analyzed {filename} | Samples: {a.selected_samples()} | Freq: {a.freq:.2f}")
+
+    def update(self, bases, freqs, settle=0.5):
+        """
+        Re-analyze changed files and rebuild the wavetable if anything changed.
+
+        Returns True if the folder should be checked again because some files are still being written.
+        """
+        changed, removed, unsettled = self.scan(settle)
+
+        for name in removed:
+            del self.entries[name]
+
+        for name, signature in changed:
+            self.analyze(name, signature, bases, freqs)
+
+        if changed or removed:
+            self.write()
+
+        return unsettled
+
+    def frames(self):
+        audio = [(a, frame) for _, a, frame in self.entries.values() if a is not None]
+
+        if self.sort:
+            #sort to put longest samples/lowest frequency at the start of wavetable
+            audio.sort(key = lambda x: x[0], reverse = True)
+        else:
+            audio.sort(key = lambda x: x[0].filename)
+
+        return [frame for _, frame in audio]
+
+    def write(self):
+        frames = self.frames()
+        if len(frames) == 0:
+            print(f"No frames available for {self.input_directory}")
+            return
+
+        count, paths = WT.write_frames(frames, self.output_directory, self.filename,
+                                       self.frame_size, max_frames = self.max_frames)
+        print(f"Wrote {count} frames to {paths['wav']} and {paths['wt']}")
+
+
+class Watcher:
+    """Watches several instrument folders and rebuilds each wavetable on change"""
+
+    def __init__(self, input_directories, output_directory, frame_size=2048, sort=True,
+                 interval=1.0, settle=0.5, polling=False, max_frames=None, cycles=1, combine='mean'):
+        self.folders = {}
+        for d in input_directories:
+            d = Path(d).resolve()
+            self.folders[d] = WatchFolder(d, output_directory, frame_size, sort, max_frames, cycles, combine)
+
+        self.freqs = T.get_midi_freqs()
+        # one basis per (sample rate, decimation), kept warm for the lifetime of the watcher
+        self.bases = {}
+        self.interval = interval
+        self.settle = settle
+        self.events = create_events(interval, polling)
+        for d in self.folders:
+            self.events.add_watch(d)
+
+    def update(self, directories):
+        pending = set()
+        for d in directories:
+            if self.folders[d].update(self.bases, self.freqs, self.settle):
+                pending.add(d)
+        return pending
+
+    def run(self):
+        pending = self.update(self.folders.keys())
+        try:
+            while True:
+                directories = self.events.read(self.interval) | pending
+                pending = self.update(directories)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.events.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild wavetables whenever the .wav files of an instrument folder change")
+    parser.add_argument('directories', nargs='+', help="instrument folders, one wavetable is written per folder")
+    parser.add_argument('--output', default='../../output/', help="output directory for .wav and .wt files")
+    parser.add_argument('--frame-size', type=int, default=2048)
+    parser.add_argument('--no-sort', action='store_true', help="keep filename order instead of frequency sort")
+    parser.add_argument('--interval', type=float, default=1.0, help="polling interval in seconds")
+    parser.add_argument('--settle', type=float, default=0.5, help="seconds a file must be unchanged before analysis")
+    parser.add_argument('--max-frames', type=int, default=None, help="merge similar neighbouring frames down to this many")
+    parser.add_argument('--cycles', type=int, default=1, help="average this many consecutive cycles into each frame")
+    parser.add_argument('--combine', choices=['mean', 'median'], default='mean')
+    parser.add_argument('--poll', action='store_true', help="force polling instead of inotify")
+    args = parser.parse_args()
+
+    watcher = Watcher(args.directories, args.output, args.frame_size, not args.no_sort,
+                      args.interval, args.settle, args.poll, args.max_frames,
+                      args.cycles, args.combine)
+    watcher.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,19 @@
 import numpy as np
 import os
-import soundfile as sf
+import struct
 from pathlib import Path
-import argparse
+
+# magic, wave size, wave count, flags
+WT_HEADER = struct.Struct('<4sIHH')
+WT_MAGIC = b'vawt'
+WT_INT16 = 0x0004  # flag for 16 bit samples instead of float32
+WT_METADATA = 0x0010  # flag for trailing metadata after the sample data
+WT_MAX_COUNT = 0xFFFF
 
 def read_wav_file(filepath):
     """Read a WAV file and return its data and sample rate."""
+    # soundfile loads libsndfile, defer it until a file is actually read
+    import soundfile as sf
     data, samplerate = sf.read(filepath)
     return data, samplerate
 
@@ -27,3 +35,201 @@ def save_wt_file(wt_data, output_filepath):
     """Save the WT formatted data to a file."""
     with open(output_filepath, 'wb') as file:
         file.write(wt_data)
+
+
+def atomic_write(output_filepath, write):
+    """
+    Write a file through a temporary file in the same directory,
+    then move it over the target so readers never see a partial file.
+
+    write is called with the temporary path.
+    """
+    output_filepath = Path(output_filepath)
+    tmp = output_filepath.with_name(f".{output_filepath.name}.{os.getpid()}.tmp")
+    try:
+        write(tmp)
+        os.replace(tmp, output_filepath)
+    except BaseException:
+        if tmp.exists():
+            tmp.unlink()
+        raise
+
+
+def read_wt_header(filepath):
+    """Read a WT header and return (wave_size, wave_count, flags)."""
+    with open(filepath, 'rb') as file:
+        header = file.read(WT_HEADER.size)
+    if len(header) < WT_HEADER.size:
+        raise ValueError(f"{filepath} is too short to be a .wt file")
+
+    magic, wave_size, wave_count, flags = WT_HEADER.unpack(header)
+    if magic != WT_MAGIC:
+        raise ValueError(f"{filepath} does not start with {WT_MAGIC}")
+    return wave_size, wave_count, flags
+
+def wt_dtype(flags):
+    return np.dtype('<i2') if flags & WT_INT16 else np.dtype('<f4')
+
+def read_wt_file(filepath):
+    """
+    Memory map a WT file.
+
+    Returns a read only (wave_count, wave_size) array view of the frames and the flags.
+    Nothing is decoded or copied, frames are paged in from disk when touched.
+    """
+    wave_size, wave_count, flags = read_wt_header(filepath)
+    if wave_count == 0 or wave_size == 0:
+        # nothing to map, mmap refuses empty ranges
+        return np.empty((wave_count, wave_size), dtype=wt_dtype(flags)), flags
+    frames = np.memmap(filepath, dtype=wt_dtype(flags), mode='r',
+                       offset=WT_HEADER.size, shape=(wave_count, wave_size))
+    return frames, flags
+
+def validate_wt_file(filepath, check_values=False):
+    """
+    Check a WT file and return a list of problems, empty when the file is valid.
+    check_values also scans the samples for NaN/inf which reads the whole file.
+    """
+    try:
+        wave_size, wave_count, flags = read_wt_header(filepath)
+    except ValueError as e:
+        return [str(e)]
+
+    problems = []
+    if wave_size == 0:
+        problems.append("wave size is 0")
+    if wave_count == 0:
+        problems.append("wave count is 0")
+
+    expected = WT_HEADER.size + wave_size * wave_count * wt_dtype(flags).itemsize
+    size = os.path.getsize(filepath)
+    if size < expected:
+        problems.append(f"file has {size} bytes, header requires {expected}")
+    elif size > expected and not flags & WT_METADATA:
+        problems.append(f"{size - expected} unexpected trailing bytes")
+
+    if check_values and not problems:
+        frames, _ = read_wt_file(filepath)
+        if not np.all(np.isfinite(frames)):
+            problems.append("frames contain NaN or inf values")
+
+    return problems
+
+def write_wt_frames(output_filepath, selections):
+    """
+    Stream frames from memory mapped WT files to a new WT file.
+
+    selections is a list of (frames, flags, rows) where frames comes from read_wt_file
+    and rows is a slice or sequence of frame indices.
+    All inputs must share wave size and sample format; samples are copied as raw bytes.
+    """
+    if len(selections) == 0:
+        raise ValueError("no frames selected")
+
+    wave_size = selections[0][0].shape[1]
+    flags = selections[0][1]
+
+    counts = []
+    for frames, f, rows in selections:
+        if frames.shape[1] != wave_size:
+            raise ValueError(f"wave size {frames.shape[1]} does not match {wave_size}")
+        if wt_dtype(f) != wt_dtype(flags):
+            raise ValueError("cannot merge 16 bit and float32 wavetables without re-quantizing")
+        counts.append(len(range(frames.shape[0])[rows]) if isinstance(rows, slice) else len(rows))
+
+    wave_count = sum(counts)
+    if wave_count == 0:
+        raise ValueError("no frames selected")
+    if wave_count > WT_MAX_COUNT:
+        raise ValueError(f"{wave_count} frames exceeds the .wt limit of {WT_MAX_COUNT}")
+
+    def write(tmp):
+        with open(tmp, 'wb') as file:
+            file.write(WT_HEADER.pack(WT_MAGIC, wave_size, wave_count, flags & ~WT_METADATA))
+            for (frames, _, rows), count in zip(selections, counts):
+                if count == 0:
+                    continue
+                if isinstance(rows, slice) and rows.step in (None, 1):
+                    # contiguous block, one write straight from the mapping
+                    file.write(memoryview(frames[rows]).cast('B'))
+                else:
+                    for i in np.arange(frames.shape[0])[rows]:
+                        file.write(memoryview(frames[i]).cast('B'))
+
+    atomic_write(output_filepath, write)
+    return wave_count
+
+def merge_wt_files(filepaths, output_filepath):
+    """Concatenate whole WT files in order."""
+    selections = []
+    for p in filepaths:
+        frames, flags = read_wt_file(p)
+        selections.append((frames, flags, slice(None)))
+    return write_wt_frames(output_filepath, selections)
+
+def slice_wt_file(filepath, output_filepath, start=None, stop=None, step=None):
+    """Copy frames[start:stop:step] of a WT file to a new file."""
+    frames, flags = read_wt_file(filepath)
+    return write_wt_frames(output_filepath, [(frames, flags, slice(start, stop, step))])
+
+def reorder_wt_file(filepath, output_filepath, order):
+    """Write the frames of a WT file in the given index order (indices may repeat or be dropped)."""
+    frames, flags = read_wt_file(filepath)
+    order = np.asarray(order, dtype=int)
+    if order.size and (order.min() < -frames.shape[0] or order.max() >= frames.shape[0]):
+        raise IndexError(f"frame index out of range for {frames.shape[0]} frames")
+    return write_wt_frames(output_filepath, [(frames, flags, order)])
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect, validate, and combine .wt wavetables")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    info = commands.add_parser('info', help="print header information")
+    info.add_argument('files', nargs='+')
+
+    validate = commands.add_parser('validate', help="check headers and file sizes")
+    validate.add_argument('files', nargs='+')
+    validate.add_argument('--values', action='store_true', help="also check samples for NaN/inf")
+
+    merge = commands.add_parser('merge', help="concatenate tables in order")
+    merge.add_argument('output')
+    merge.add_argument('files', nargs='+')
+
+    slicer = commands.add_parser('slice', help="copy a range of frames")
+    slicer.add_argument('input')
+    slicer.add_argument('output')
+    slicer.add_argument('--start', type=int, default=None)
+    slicer.add_argument('--stop', type=int, default=None)
+    slicer.add_argument('--step', type=int, default=None)
+
+    reorder = commands.add_parser('reorder', help="write frames in a new order")
+    reorder.add_argument('input')
+    reorder.add_argument('output')
+    reorder.add_argument('order', help="comma separated frame indices, e.g. 3,2,1,0")
+
+    args = parser.parse_args()
+
+    if args.command == 'info':
+        for p in args.files:
+            wave_size, wave_count, flags = read_wt_header(p)
+            print(f"{p}: {wave_count} frames x {wave_size} samples, {wt_dtype(flags)}, flags {flags:#06x}")
+    elif args.command == 'validate':
+        failed = False
+        for p in args.files:
+            problems = validate_wt_file(p, args.values)
+            failed = failed or len(problems) > 0
+            print(f"{p}: {'ok' if not problems else '; '.join(problems)}")
+        raise SystemExit(1 if failed else 0)
+    elif args.command == 'merge':
+        print(f"Wrote {merge_wt_files(args.files, args.output)} frames to {args.output}")
+    elif args.command == 'slice':
+        print(f"Wrote {slice_wt_file(args.input, args.output, args.start, args.stop, args.step)} frames to {args.output}")
+    elif args.command == 'reorder':
+        order = [int(i) for i in args.order.split(',')]
+        print(f"Wrote {reorder_wt_file(args.input, args.output, order)} frames to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,15 +7,22 @@ from pathlib import Path
 import time
 
 import wtmaker as WT
+import pipeline as P
+import session
+import arena as A
+import raster as R
 from functools import reduce
 
 class AudioAnalysisChild:
     """Individual audio analysis component with canvas and controls"""
     
-    def __init__(self, parent_frame, index, callback_update_audio=None):
+    RASTER_CACHE_SIZE = 4
+
+    def __init__(self, parent_frame, index, callback_update_audio=None, raster=False):
         self.parent_frame = parent_frame
         self.index = index
         self.callback_update_audio = callback_update_audio
+        self.raster = raster
 
         self.display_multiplier = tk.IntVar(value=5)
         
@@ -25,6 +32,23 @@ class AudioAnalysisChild:
         # Index tracking
         self.green_line_x = 0
         self.red_line_x = 0
+        self.x_scale = 0
+        # start sample of the last draw, None until the first draw so that draw keeps
+        # the end index the audio came with (e.g. one restored by load_session)
+        self.marker_start = None
+
+        # Marker being dragged with the mouse: marker name, crossing index, and preview line
+        self.drag_marker = None
+        self.drag_index = 0
+        self.drag_line = None
+
+        # Raster rendering, base images without markers keyed by (audio, zoom, width, height)
+        self.raster_cache = {}
+        self.raster_key = None
+        self.raster_buffer = None
+        self.raster_markers = []
+        self.photo = None
+        self.photo_item = None
         
         # Create the container frame
         self.container = ttk.Frame(parent_frame, relief='raised', borderwidth=2, padding=10)
@@ -75,10 +99,17 @@ class AudioAnalysisChild:
         # Bind canvas resize
         self.canvas.bind('<Configure>', self.on_canvas_resize)
 
-    def get_analysis_text(self):
+        # Click or drag to place the nearest marker on a zero crossing
+        self.canvas.bind('<ButtonPress-1>', self.on_marker_press)
+        self.canvas.bind('<B1-Motion>', self.on_marker_drag)
+        self.canvas.bind('<ButtonRelease-1>', self.on_marker_release)
+
+    def get_analysis_text(self, start=None, end=None):
         audio_data = AudioAnalysisGUI.audio_data[self.index]
         expected =  audio_data.period_samples()
-        actual = audio_data.zero_crossing_end() - audio_data.zero_crossing_start()
+        start = audio_data.zero_crossing_start() if start is None else start
+        end = audio_data.zero_crossing_end() if end is None else end
+        actual = end - start
         return f"Frequency (Hz): {audio_data.freq:.2f} | Expected Samples {expected} | Actual Samples: {actual}\n{audio_data.filename}"
         
     def get_frequency(self):
@@ -99,7 +130,12 @@ class AudioAnalysisChild:
     
     def draw_waveform(self):
         """Draw the audio waveform on canvas"""
+        if self.raster:
+            self.draw_waveform_raster()
+            return
+
         self.canvas.delete("all")
+        self.photo_item = None
         audio_data = AudioAnalysisGUI.audio_data[self.index]
         
         if audio_data is None or audio_data.samples() == 0:
@@ -114,7 +150,6 @@ class AudioAnalysisChild:
         # Prepare data for display
   
         self.display_samples = self.display_multiplier.get() * max(audio_data.period_samples(), audio_data.crossing_samples)
-        print(audio_data.values.shape, self.display_samples, audio_data.start_index_pos(), audio_data.end_index_pos())
         display_data = audio_data.values[:self.display_samples]
         if display_data.shape[0] == 0:
             return
@@ -151,37 +186,106 @@ class AudioAnalysisChild:
         canvas_width = self.canvas.winfo_width()
         
         x_scale = canvas_width / self.display_samples
+        self.x_scale = x_scale
         
+        end = self.marker_end(audio_data)
+        self.green_line_x = audio_data.zero_crossing_start() * x_scale
+        self.red_line_x = end * x_scale
+
+        # the canvas is cleared on every redraw, so both lines are always drawn
         # Green line (start)
-        ref = audio_data.zero_crossing_start() * x_scale
-        
-        if self.green_line_x != ref:
-            self.green_line_x = ref
-            self.canvas.create_line(self.green_line_x, 0, self.green_line_x, 
-                                self.canvas.winfo_height(), fill='green', width=2)
-            
-            # Red line (end)
-            self.red_line_x = audio_data.find_nearest_period_end() * x_scale
-            self.canvas.create_line(self.red_line_x, 0, self.red_line_x, 
-                                self.canvas.winfo_height(), fill='red', width=2)
+        self.canvas.create_line(self.green_line_x, 0, self.green_line_x,
+                            self.canvas.winfo_height(), fill='green', width=2, tags='start')
+        # Red line (end)
+        self.canvas.create_line(self.red_line_x, 0, self.red_line_x,
+                            self.canvas.winfo_height(), fill='red', width=2, tags='end')
+
+        self.update_labels(audio_data)
+
+    def marker_end(self, audio_data):
+        """End sample to draw, a start moved since the last draw picks the nearest period end"""
+        start = audio_data.zero_crossing_start()
+        if self.marker_start is not None and self.marker_start != start:
+            end = audio_data.find_nearest_period_end()
         else:
-            self.green_line_x = audio_data.zero_crossing_start() * x_scale
-            self.canvas.create_line(self.green_line_x, 0, self.green_line_x, 
-                                self.canvas.winfo_height(), fill='green', width=2)
-            
-            ref = audio_data.zero_crossing_end() * x_scale
+            end = audio_data.zero_crossing_end()
+        self.marker_start = start
+        return end
+    
+    def draw_waveform_raster(self):
+        """
+        Draw the waveform as one PhotoImage.
 
-            if self.red_line_x != ref:
-                self.red_line_x = ref
-                self.canvas.create_line(self.red_line_x, 0, self.red_line_x, 
-                                    self.canvas.winfo_height(), fill='red', width=2)
-        
+        The base image is cached per (audio, zoom, width, height); when only the markers
+        moved, just their columns are patched into the existing image.
+        """
+        audio_data = AudioAnalysisGUI.audio_data[self.index]
+
+        if audio_data is None or audio_data.samples() == 0:
+            return
+
+        canvas_width = self.canvas.winfo_width()
+        canvas_height = self.canvas.winfo_height()
+
+        if canvas_width <= 1 or canvas_height <= 1:
+            return
+
+        self.display_samples = self.display_multiplier.get() * max(audio_data.period_samples(), audio_data.crossing_samples)
+        display_samples = min(self.display_samples, audio_data.samples())
+        if display_samples == 0:
+            return
+
+        key = (id(audio_data), display_samples, canvas_width, canvas_height)
+        base = self.raster_cache.get(key)
+        if base is None:
+            base = R.render_waveform(audio_data.values[:display_samples], canvas_width, canvas_height)
+            if len(self.raster_cache) >= AudioAnalysisChild.RASTER_CACHE_SIZE:
+                self.raster_cache.pop(next(iter(self.raster_cache)))
+            self.raster_cache[key] = base
+
+        start = audio_data.zero_crossing_start()
+        end = self.marker_end(audio_data)
+
+        x_scale = canvas_width / display_samples
+        self.x_scale = x_scale
+        markers = [(start * x_scale, R.START), (end * x_scale, R.END)]
+
+        if key != self.raster_key or self.photo_item is None:
+            self.raster_key = key
+            self.raster_buffer = base.copy()
+            columns = [R.draw_marker(self.raster_buffer, x, color) for x, color in markers]
+
+            self.canvas.delete("all")
+            self.photo = tk.PhotoImage(data=R.to_ppm(self.raster_buffer), format='PPM')
+            self.photo_item = self.canvas.create_image(0, 0, image=self.photo, anchor='nw')
+            self.raster_markers = columns
+        else:
+            self.patch_raster_markers(markers)
+
+        self.update_labels(audio_data)
+
+    def patch_raster_markers(self, markers):
+        """Restore the old marker columns from the base image, then draw markers [(x, color)] on top"""
+        base = self.raster_cache[self.raster_key]
+        width = self.raster_buffer.shape[1]
+
+        columns = [R.marker_columns(x, width) for x, _ in markers]
+        dirty = self.raster_markers + columns
+        for x0, x1 in self.raster_markers:
+            self.raster_buffer[:, x0:x1] = base[:, x0:x1]
+        for x, color in markers:
+            R.draw_marker(self.raster_buffer, x, color)
+        for x0, x1 in dirty:
+            if x1 > x0:
+                self.photo.put(R.to_put_data(self.raster_buffer[:, x0:x1]), to=(x0, 0))
+
+        self.raster_markers = columns
+
+    def update_labels(self, audio_data):
         self.start_label.config(text=str(audio_data.zero_crossing_start()))
         self.end_label.config(text=str(audio_data.zero_crossing_end()))
         self.status_label.config(text = str(self.get_analysis_text()))
 
-    
-    
     def move_start_left(self):
         """Move start index to the left (lock to zero crossing)"""
         a =  AudioAnalysisGUI.audio_data[self.index]
@@ -220,6 +324,73 @@ class AudioAnalysisChild:
         # self.status_label.config(text =str(self.get_analysis_text()))
         self.draw_waveform()
     
+    def snap_to_crossing(self, x, marker):
+        """Index into zero_crossing_starts nearest to canvas x, limited like the arrow buttons"""
+        a = AudioAnalysisGUI.audio_data[self.index]
+        crossings = a.zero_crossing_starts
+        sample = x / self.x_scale
+
+        right = int(np.clip(np.searchsorted(crossings, sample), 1, crossings.shape[0] - 1))
+        index = right - 1 if sample - crossings[right - 1] <= crossings[right] - sample else right
+
+        low = a.start_min if marker == 'start' else a.start_index
+        return int(min(max(index, low), crossings.shape[0] - 1))
+
+    def on_marker_press(self, event):
+        """Grab the marker nearest to the click and remove it from the drawing until release"""
+        a = AudioAnalysisGUI.audio_data[self.index]
+        if self.x_scale <= 0 or a.zero_crossing_starts.shape[0] < 2:
+            return
+
+        start_x = a.zero_crossing_start() * self.x_scale
+        end_x = a.zero_crossing_end() * self.x_scale
+        self.drag_marker = 'start' if abs(event.x - start_x) < abs(event.x - end_x) else 'end'
+
+        if self.raster and self.photo_item is not None:
+            # keep only the other marker in the image
+            other = (end_x, R.END) if self.drag_marker == 'start' else (start_x, R.START)
+            self.patch_raster_markers([other])
+        else:
+            self.canvas.delete(self.drag_marker)
+
+        color = 'green' if self.drag_marker == 'start' else 'red'
+        self.drag_line = self.canvas.create_line(0, 0, 0, self.canvas.winfo_height(), fill=color, width=2)
+        self.on_marker_drag(event)
+
+    def on_marker_drag(self, event):
+        """Move only the preview line and the status text"""
+        if self.drag_marker is None:
+            return
+
+        a = AudioAnalysisGUI.audio_data[self.index]
+        self.drag_index = self.snap_to_crossing(event.x, self.drag_marker)
+        sample = a.zero_crossing_starts[self.drag_index]
+        x = sample * self.x_scale
+        self.canvas.coords(self.drag_line, x, 0, x, self.canvas.winfo_height())
+
+        if self.drag_marker == 'start':
+            self.start_label.config(text=str(sample))
+            self.status_label.config(text=self.get_analysis_text(start=sample))
+        else:
+            self.end_label.config(text=str(sample))
+            self.status_label.config(text=self.get_analysis_text(end=sample))
+
+    def on_marker_release(self, event):
+        """Commit the dragged marker to the Audio indices and redraw once"""
+        if self.drag_marker is None:
+            return
+
+        a = AudioAnalysisGUI.audio_data[self.index]
+        if self.drag_marker == 'start':
+            a.start_index = self.drag_index
+        else:
+            a.end_index = self.drag_index
+
+        self.canvas.delete(self.drag_line)
+        self.drag_line = None
+        self.drag_marker = None
+        self.draw_waveform()
+
     def on_canvas_resize(self, event):
         """Handle canvas resize"""
         self.draw_waveform()
@@ -273,6 +444,9 @@ class AnalysisWindow:
         # Create button
         self.create_button = ttk.Button(button_frame, text="Create", command=self.on_create)
         self.create_button.pack(side='right')
+
+        self.save_button = ttk.Button(button_frame, text="Save Session", command=self.on_save_session)
+        self.save_button.pack(side='right', padx=(0, 5))
         
         # Add initial child component
         for i, a in enumerate(AudioAnalysisGUI.audio_data):
@@ -322,7 +496,8 @@ class AnalysisWindow:
     def add_audio_component(self, index, audio_data):
         """Add a new audio analysis component with provided data"""
         
-        self.children.append(AudioAnalysisChild(self.scrollable_frame, index, audio_data))
+        raster = self.parent_gui.raster.get()
+        self.children.append(AudioAnalysisChild(self.scrollable_frame, index, audio_data, raster))
     
     def on_create(self):
         """Handle create button click - placeholder for model integration"""
@@ -336,10 +511,16 @@ class AnalysisWindow:
             #based on user selected sample length
             AudioAnalysisGUI.audio_data.sort(reverse = True) 
         
+        max_frames = self.parent_gui.get_max_frames()
+        frame_count = len(AudioAnalysisGUI.audio_data)
+        if max_frames is not None:
+            frame_count = min(frame_count, max_frames)
+
         if self.parent_gui.include_frame_count.get() and self.parent_gui.sort.get():
-            self.filename = f"{self.filename}_{len(AudioAnalysisGUI.audio_data)}"
+            self.filename = f"{self.filename}_{frame_count}"
 
-        WT.Audio.create_wavetable(AudioAnalysisGUI.audio_data, self.output_directory, self.filename)
+        WT.Audio.create_wavetable(AudioAnalysisGUI.audio_data, self.output_directory, self.filename, max_frames,
+                                  self.parent_gui.get_cycles(), self.parent_gui.combine.get())
         WT.Audio.create_wt_wavetable(self.output_directory, self.filename)
 
         AudioAnalysisGUI.audio_data=[] #reset system to prepare for next load
@@ -348,6 +529,20 @@ class AnalysisWindow:
         self.on_close()
 
     
+    def on_save_session(self):
+        """Save the current analysis so it can be reopened without loading the .wav files again"""
+        path = filedialog.asksaveasfilename(
+            title="Save Session",
+            parent=self.window,
+            initialdir=self.output_directory,
+            initialfile=self.filename + '.npz',
+            defaultextension='.npz',
+            filetypes=[("Session", "*.npz")]
+        )
+        if path:
+            session.save_session(path, AudioAnalysisGUI.audio_data)
+            messagebox.showinfo("Save Session", f"Session saved to {path}", parent=self.window)
+
     def on_close(self):
         """Close the analysis window"""
         self.window.destroy()
@@ -366,7 +561,8 @@ class AudioAnalysisGUI:
         self.filename = tk.StringVar(value="wavetable")
         self.input_directory = ""
 
-        self.cmatrix = []
+        # (srate, decimation) -> matrices.Basis, kept warm between loads
+        self.bases = {}
         self.srate = 48000
         self.samples = 0
         self.freqs = WT.T.get_midi_freqs()
@@ -428,6 +624,9 @@ class AudioAnalysisGUI:
         
         self.load_button = ttk.Button(load_frame, text="Load Files", command=self.load_files)
         self.load_button.pack(side='left')
+
+        self.load_session_button = ttk.Button(load_frame, text="Load Session", command=self.load_session)
+        self.load_session_button.pack(side='left', padx=(5, 0))
         
         # # Status label
         # self.status_label = ttk.Label(load_frame, text="")
@@ -455,6 +654,50 @@ class AudioAnalysisGUI:
         self.include_frame_count_box = tk.Checkbutton(checkbox_section, text="Include Frame Count", variable=self.include_frame_count)
         self.include_frame_count_box.pack(side = 'left')
 
+        self.limit_frames = tk.BooleanVar()
+        self.limit_frames.set(False)
+
+        self.limit_frames_box = tk.Checkbutton(checkbox_section, text="Max Frames", variable=self.limit_frames)
+        self.limit_frames_box.pack(side = 'left')
+
+        self.max_frames = tk.IntVar(value=256)
+        self.max_frames_spinbox = tk.Spinbox(checkbox_section, from_=1, to=4096, width=6, textvariable=self.max_frames)
+        self.max_frames_spinbox.pack(side = 'left')
+
+        self.raster = tk.BooleanVar()
+        self.raster.set(True)
+
+        self.raster_box = tk.Checkbutton(checkbox_section, text="Raster Waveforms", variable=self.raster)
+        self.raster_box.pack(side = 'left')
+
+        cycles_section = ttk.LabelFrame(parent, text="Frame Averaging", padding="5")
+        cycles_section.pack(fill='x', pady=(0, 10))
+
+        ttk.Label(cycles_section, text="Cycles:").pack(side = 'left')
+        self.cycles = tk.IntVar(value=1)
+        self.cycles_spinbox = tk.Spinbox(cycles_section, from_=1, to=32, width=4, textvariable=self.cycles)
+        self.cycles_spinbox.pack(side = 'left', padx=(5, 10))
+
+        self.combine = tk.StringVar(value='mean')
+        self.combine_box = ttk.Combobox(cycles_section, textvariable=self.combine, values=['mean', 'median'], state='readonly', width=8)
+        self.combine_box.pack(side = 'left')
+
+    def get_cycles(self):
+        """Number of consecutive cycles averaged into each frame"""
+        try:
+            return max(1, self.cycles.get())
+        except tk.TclError:
+            return 1
+
+    def get_max_frames(self):
+        """Frame limit for export, None when the table should keep every frame"""
+        if not self.limit_frames.get():
+            return None
+        try:
+            return max(1, self.max_frames.get())
+        except tk.TclError:
+            return None
+
     
     def create_status_section(self, parent):
         status_frame = ttk.LabelFrame(parent, text="Status", padding="5")
@@ -475,16 +718,18 @@ class AudioAnalysisGUI:
 
     
     def create_audio_data(self, files):
+        """Decode and analyze files, decoding of the next files overlaps with analysis of the current one"""
+        paths = [self.input_directory/f for f in files]
+        # samples and crossings of the whole session live in one arena, the list holds lightweight views
+        self.arena = A.AudioArena()
         start_time = time.time()
-        for i, f in enumerate(files):
-            a = WT.Audio.fromfilename(self.input_directory/f)
-            # a.set_start_near_max_peak()
-            self.audio_data.append(a)
+        for i, a in enumerate(P.load_audio(paths, self.freqs, bases = self.bases)):
+            self.audio_data.append(self.arena.append(a))
             if(time.time() - start_time > 1):
-                self.status_label.config(text=f"Selected: {self.input_directory} \nLoaded {i+ 1} / {len(files)} files")
+                self.status_label.config(text=f"Selected: {self.input_directory} \nLoaded and analyzed {i+ 1} / {len(files)} files")
                 self.status_label.update()
                 start_time = time.time()
-        self.status_label.config(text=f"Selected: {self.input_directory} \nLoaded {i+ 1} / {len(files)} files")
+        self.status_label.config(text=f"Selected: {self.input_directory} \nLoaded and analyzed {i+ 1} / {len(files)} files")
         self.status_label.update()
     
 
@@ -493,31 +738,19 @@ class AudioAnalysisGUI:
         while(time.time() - start_time < seconds):
             pass
 
-    def update_frequencies(self):
+    def check_sample_rates(self):
 
         common_srates = list(map(lambda x: x.srate, self.audio_data))
         common_srates = list(map(lambda x: x == common_srates[0], common_srates))
-        common_srates = reduce(lambda a, b: a == b, common_srates)
-
-        
+        common_srates = reduce(lambda a, b: a and b, common_srates)
 
         if common_srates:
             data = AudioAnalysisGUI.audio_data
             self.samples = max(list(map(lambda x: x.samples(), data)))
             self.srate = data[0].srate
-
-            self.cmatrix = WT.M.cmatrix(self.samples, self.srate, self.freqs)
-            start_time = time.time()
-            for i, a in enumerate(data):
-                a.set_freq(self.cmatrix,self.freqs)
-                if(time.time() - start_time > 1):
-                    self.status_label.config(text=f"Selected: {self.input_directory} \nAnalyzing file {i + 1} / {len(data)}")
-                    self.status_label.update()
-                    start_time = time.time()
-            self.status_label.config(text=f"Selected: {self.input_directory} \nAnalyzing file {i + 1} / {len(data)}")
-            self.status_label.update()
         else:
             self.status_label.config(text=f".wav files had different sample rates.\n Please use file with a common sample rate")
+            self.status_label.update()
 
     def load_files(self):
         """Load files from selected directory and open analysis window"""
@@ -548,7 +781,7 @@ class AudioAnalysisGUI:
                 self.create_audio_data(files)
                 self.delay(delay_time)
 
-                self.update_frequencies()
+                self.check_sample_rates()
                 self.delay(delay_time)
 
                 self.status_label.config(text=f"Selected: {self.input_directory} \nFile load complete!")
@@ -564,6 +797,26 @@ class AudioAnalysisGUI:
                 
                 self.open_analysis_window()
     
+    def load_session(self):
+        """Reopen a session saved from the analysis window"""
+        path = filedialog.askopenfilename(
+            title="Load Session",
+            initialdir=self.output_directory.get(),
+            filetypes=[("Session", "*.npz")]
+        )
+        if not path:
+            return
+
+        AudioAnalysisGUI.audio_data = session.load_session(path)
+        if len(AudioAnalysisGUI.audio_data) == 0:
+            self.status_label.config(text=f"Session {path} is empty")
+            return
+
+        self.srate = AudioAnalysisGUI.audio_data[0].srate
+        self.filename.set(Path(path).stem)
+        self.status_label.config(text=f"Loaded session {path} \n{len(AudioAnalysisGUI.audio_data)} files")
+        self.open_analysis_window()
+
     def open_analysis_window(self):
         """Open the analysis window"""
         analysis_window = AnalysisWindow(self, self.root, self.output_directory.get(), self.filename.get())
@@ -1,12 +1,8 @@
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
-
-from scipy.io import wavfile
-from scipy import interpolate
 
 import tuning as T
 import matrices as M
+import reduction as R
 import wav2wt
 
 import os
@@ -14,51 +10,32 @@ from pathlib import Path
 import re
 
 
-class Audio:
+def read_wav(filename):
+    """Decode a .wav file and return (srate, values) mixed down to one channel"""
+    # scipy.io is imported on first use to keep the core quick to import
+    from scipy.io import wavfile
+    data = wavfile.read(filename)
+    srate = data[0]
+    values = data[1]
+    # data will be normalized internally
+    # so attempt a mixdown if there are more than one channels
+    if len(values.shape) > 1:
+        values = data[1].sum(axis = 1)
+    return srate, values
 
-    def __init__(self, srate, values, filename=''):
-        self.srate = srate
-        self.values = values[np.argmax(values):].copy() #moving the values away from 0 for convenience
-        self.freq = 0
-        self.filename = filename
-        
 
-        prev = np.roll(self.values, 1)
+class AudioMethods:
+    """
+    Analysis methods shared by Audio and the lightweight views of arena.AudioArena.
 
-        starts = ((prev <= 0) & (self.values > 0))
-        ends =   ((prev >= 0) & (self.values < 0))
-
-        self.zero_crossing_starts = Audio.get_non_zero_indices(starts)
-        self.zero_crossing_ends = Audio.get_non_zero_indices(ends)
-
-        self.crossing_samples = self.get_crossing_samples()
+    Subclasses provide srate, values, freq, filename, zero_crossing_starts,
+    zero_crossing_ends, crossing_samples, start_min, start_index and end_index.
+    """
+    __slots__ = ()
 
-        self.start_min = 0
-        self.start_index = 0
-        self.end_index = 0
-
-    @classmethod
-    def fromfilename(cls, filename):
-        data = wavfile.read(filename)
-        srate = data[0]
-        values = data[1]
-        # data will be normalized internally
-        # so attempt a mixdown if there are more than one channels
-        if len(values.shape) > 1:
-            values = data[1].sum(axis = 1)
-        return cls(srate, values, filename)
-    
-    @classmethod
-    def from_arr(cls, srate, arr):
-        return cls(srate, arr)
-    
     def __lt__(self,other):
         return self.selected_samples() < other.selected_samples()
     
-    def get_non_zero_indices(indices):
-        output = indices * np.arange(indices.shape[0])
-        return output[output != 0]
-        
     def samples(self):
         return self.values.shape[0]
     
@@ -71,9 +48,103 @@ class Audio:
     def period_samples(self):
         return int(self.srate/max(self.freq,1))
 
-    def set_freq(self, cmat, freqs):
-        transform = M.cdft(cmat, self.values)
-        self.freq = M.get_freq(transform, freqs)
+    def analyze(self, bases, freqs, trajectory = True):
+        """
+        set_freq at a reduced analysis rate.
+
+        The values are decimated by the largest factor the grid allows
+        (see matrices.decimation_factor) and the cdft runs against a basis built at
+        that rate. bases is a dict keyed by (srate, factor) that holds the growing
+        bases so they can be shared between files.
+        Crossing detection and slicing still use the full rate values.
+        """
+        factor = M.decimation_factor(self.srate, freqs)
+        key = (self.srate, factor)
+        if key not in bases:
+            bases[key] = M.Basis(self.srate / factor, freqs)
+
+        cmat = bases[key].get(M.decimated_length(self.samples(), factor))
+        self.set_freq(cmat, freqs, trajectory, factor)
+
+    def set_freq(self, cmat, freqs, trajectory = True, decimation = 1):
+        """
+        Detect the frequency of the note.
+
+        With trajectory the pitch is tracked over short windows (see pitch_trajectory),
+        the frequency is the one that dominates the track and the start is moved
+        to the first zero crossing of the most stable window.
+
+        decimation > 1 expects a cmat built at srate / decimation.
+        """
+        signal = M.decimate(self.values, decimation)
+
+        window, hop = self.trajectory_window()
+        if not trajectory or window >= self.samples():
+            transform = M.cdft(cmat, signal)
+            self.freq = M.get_harmonic_freq(transform, freqs)
+            return
+
+        starts, pitch, stability, freq = self.pitch_trajectory(cmat, freqs, window, hop, decimation, signal)
+        self.freq = freq
+
+        best = starts[np.argmax(stability)]
+        index = np.searchsorted(self.zero_crossing_starts, best)
+        self.start_index = int(min(max(index, self.start_min), self.zero_crossing_starts.shape[0] - 1))
+
+    def trajectory_window(self):
+        # long enough for semitone resolution of mid range notes and several periods of low notes
+        window = max(self.srate // 5, 8 * self.crossing_samples)
+        return window, max(window // 2, 1)
+
+    def pitch_trajectory(self, cmat, freqs, window = None, hop = None, decimation = 1, signal = None, gate = 0.1):
+        """
+        Short time pitch track over overlapping windows of the values.
+
+        Returns (window starts, pitch per window, stability per window, dominant freq).
+        The dominant freq is the pitch holding the most energy across all windows.
+        Stability measures pitch constancy (the share of the window and its neighbours
+        at the dominant pitch) and low spectral flux to the neighbouring windows.
+        Energy is only a gate: windows below gate times the loudest window, or at any
+        other pitch, get 0. The loudness of a window does not scale its score, so a
+        decaying note's attack window does not win just because it is the loudest.
+
+        window, hop and the returned starts are in full rate samples, the analysis runs
+        on signal (the values decimated by decimation) against a cmat at the reduced rate.
+        """
+        if window is None or hop is None:
+            window, hop = self.trajectory_window()
+        if signal is None:
+            signal = M.decimate(self.values, decimation)
+
+        window = max(min(window // decimation, signal.shape[0]), 1)
+        hop = max(hop // decimation, 1)
+
+        amp = M.short_time_cdft(cmat, signal, window, hop)
+        pitch = M.get_harmonic_freq(amp, freqs)
+        starts = np.arange(amp.shape[0]) * hop * decimation
+
+        energy = amp.sum(axis = 1)
+        choices, inverse = np.unique(pitch, return_inverse = True)
+        freq = choices[np.argmax(np.bincount(inverse, weights = energy))]
+
+        # spectral change to the neighbouring windows on unit length spectra
+        unit = amp / np.maximum(np.linalg.norm(amp, axis = 1, keepdims = True), 1e-12)
+        flux = np.linalg.norm(np.diff(unit, axis = 0), axis = 1)
+        change = np.zeros(amp.shape[0])
+        if flux.shape[0] > 0:
+            change[:-1] += flux
+            change[1:] += flux
+            change[1:-1] /= 2
+
+        # share of each window and its neighbours that sit on the dominant pitch
+        on_pitch = (pitch == freq).astype(np.float64)
+        padded = np.pad(on_pitch, 1)
+        counts = np.pad(np.ones(on_pitch.shape[0]), 1)
+        constancy = (padded[:-2] + padded[1:-1] + padded[2:]) / (counts[:-2] + counts[1:-1] + counts[2:])
+
+        stability = constancy * (1 - change / 2)
+        stability[(pitch != freq) | (energy < gate * np.max(energy))] = 0
+        return starts, pitch, stability, freq
 
     def get_crossing_samples(self):
         #gets # of samples between zero crossing with some filtering
@@ -133,26 +204,151 @@ class Audio:
         
         return output
     
-    def create_frame(self, frame_size, peak = 32767):
+    def cycle_starts(self, cycles):
+        """
+        Start samples of up to `cycles` consecutive cycles beginning at the selected start.
+        Each later cycle starts at the zero crossing nearest to a whole number of
+        selected periods after the start, and must fit inside the signal.
+        """
         start = self.zero_crossing_start()
-        end = self.zero_crossing_end()
-        final_slice = self.values[start:end]
-        x = np.linspace(0, frame_size, final_slice.shape[0])
-        f = interpolate.interp1d(x,final_slice)
-        frame = f(np.arange(frame_size))
-        frame = peak * frame/np.max(np.abs(frame))
+        length = self.selected_samples()
+        if cycles <= 1 or length <= 0:
+            return np.array([start])
+
+        targets = start + length * np.arange(cycles)
+        crossings = self.zero_crossing_starts
+        right = np.clip(np.searchsorted(crossings, targets), 1, crossings.shape[0] - 1)
+        left = right - 1
+        starts = np.where(targets - crossings[left] <= crossings[right] - targets, crossings[left], crossings[right])
+        starts[0] = start
+
+        return starts[starts + length <= self.samples()]
+
+    def cycle_stack(self, frame_size, cycles = 1):
+        """
+        (n_cycles, frame_size) stack of cycles resampled to frame_size.
+
+        Linear interpolation is done by gathering directly from self.values with
+        index arrays, so the source is never sliced into per cycle copies.
+        With one cycle this matches the single slice interpolation used before.
+        """
+        starts = self.cycle_starts(cycles)
+        length = self.selected_samples()
+
+        # sample position inside a cycle for every frame index
+        pos = np.arange(frame_size) * (length - 1) / frame_size
+        offset = np.floor(pos).astype(np.int64)
+        frac = pos - offset
+
+        i0 = starts[:, np.newaxis] + offset[np.newaxis, :]
+        i1 = np.minimum(i0 + 1, self.samples() - 1)
+        return self.values[i0] * (1 - frac) + self.values[i1] * frac
+
+    def create_frame(self, frame_size, peak = 32767, cycles = 1, combine = 'mean'):
+        """
+        cycles > 1 averages that many period matched cycles after the start
+        (combine = 'mean' or 'median') to suppress noise and transients of a single cycle
+        """
+        if self.selected_samples() < 2:
+            raise ValueError(f"selection of {self.selected_samples()} samples is too short for a frame, need at least 2")
+
+        stack = self.cycle_stack(frame_size, cycles)
+
+        if stack.shape[0] == 1:
+            frame = stack[0]
+        else:
+            # equalize the level of each cycle so a decaying note does not favor its first cycle
+            stack = stack / np.maximum(np.max(np.abs(stack), axis = 1, keepdims = True), 1e-12)
+            if combine == 'mean':
+                frame = stack.mean(axis = 0)
+            elif combine == 'median':
+                frame = np.median(stack, axis = 0)
+            else:
+                raise ValueError(f"unknown cycle combine method: {combine}")
+
+        # a silent selection stays silent instead of dividing by 0
+        level = np.max(np.abs(frame))
+        if level > 0:
+            frame = peak * frame/level
         return frame
+
+
+class Audio(AudioMethods):
+
+    def __init__(self, srate, values, filename=''):
+        self.srate = srate
+        self.values = values[np.argmax(values):].copy() #moving the values away from 0 for convenience
+        self.freq = 0
+        self.filename = filename
+        
+
+        prev = np.roll(self.values, 1)
+
+        starts = ((prev <= 0) & (self.values > 0))
+        ends =   ((prev >= 0) & (self.values < 0))
+
+        self.zero_crossing_starts = Audio.get_non_zero_indices(starts)
+        self.zero_crossing_ends = Audio.get_non_zero_indices(ends)
+
+        self.crossing_samples = self.get_crossing_samples()
+
+        self.start_min = 0
+        self.start_index = 0
+        self.end_index = 0
+
+    @classmethod
+    def fromfilename(cls, filename):
+        srate, values = read_wav(filename)
+        return cls(srate, values, filename)
     
-    def create_wavetable(audio_data, export_path, file_name):
+    @classmethod
+    def from_arr(cls, srate, arr):
+        return cls(srate, arr)
 
+    @classmethod
+    def from_analysis(cls, srate, values, zero_crossing_starts, zero_crossing_ends,
+                      filename='', freq=0, crossing_samples=0):
+        """
+        Rebuild an Audio from previously analyzed data (see session.py)
+        values are expected to be trimmed already and are not copied
+        """
+        a = cls.__new__(cls)
+        a.srate = srate
+        a.values = values
+        a.freq = freq
+        a.filename = filename
+        a.zero_crossing_starts = zero_crossing_starts
+        a.zero_crossing_ends = zero_crossing_ends
+        a.crossing_samples = crossing_samples
+        a.start_min = 0
+        a.start_index = 0
+        a.end_index = 0
+        return a
+
+    def get_non_zero_indices(indices):
+        # index 0 is never reported as a crossing since np.roll wraps around there
+        output = np.flatnonzero(indices).astype(np.int32)
+        return output[output != 0]
+
+    def create_wavetable(audio_data, export_path, file_name, max_frames = None, cycles = 1, combine = 'mean'):
+        """
+        max_frames reduces the table by merging the most similar neighbouring frames
+        see reduction.reduce_frames
+
+        cycles and combine are passed to create_frame
+        """
+        from scipy.io import wavfile
         
         frames = []        
         
         for i, a in enumerate(audio_data):
-            frames.append(a.create_frame(2048))
+            frames.append(a.create_frame(2048, cycles = cycles, combine = combine))
             print(f"Frame: {i},| Samples: {a.selected_samples()} | Freq: {a.selected_freq():.2f}")
 
-        arr = np.concatenate(frames, axis = 0)
+        arr = np.stack(frames, axis = 0)
+        if max_frames is not None and arr.shape[0] > max_frames:
+            arr = R.reduce_frames(arr, max_frames)
+            print(f"Reduced {len(frames)} frames to {arr.shape[0]}")
         arr = arr.flatten().astype(np.int16)
 
         p = Path(export_path) / (file_name + '.wav')
@@ -165,4 +361,32 @@ class Audio:
 
         wav_data, _ = wav2wt.read_wav_file(p_in)
         wt_data = wav2wt.convert_to_wt_format(wav_data, 2048)
-        wav2wt.save_wt_file(wt_data, p_out)
\ No newline at end of file
+        wav2wt.save_wt_file(wt_data, p_out)
+
+def write_frames(frames, export_path, file_name, frame_size = 2048, formats = ('wav', 'wt'), max_frames = None):
+    """
+    Write a list of frames as .wav and/or .wt wavetables without reading the .wav back.
+    Files are replaced atomically. Returns (frame count, {format: path}).
+    """
+    from scipy.io import wavfile
+
+    arr = np.stack(frames, axis = 0)
+    if max_frames is not None and arr.shape[0] > max_frames:
+        arr = R.reduce_frames(arr, max_frames)
+    count = arr.shape[0]
+    arr = arr.flatten().astype(np.int16)
+
+    Path(export_path).mkdir(parents = True, exist_ok = True)
+    paths = {}
+
+    if 'wav' in formats:
+        paths['wav'] = Path(export_path) / (file_name + '.wav')
+        wav2wt.atomic_write(paths['wav'], lambda tmp: wavfile.write(tmp, 44100, arr))
+
+    if 'wt' in formats:
+        # same normalization soundfile applies when create_wt_wavetable reads the .wav back
+        wt_data = wav2wt.convert_to_wt_format(arr.astype(np.float32) / 32768, frame_size)
+        paths['wt'] = Path(export_path) / (file_name + '.wt')
+        wav2wt.atomic_write(paths['wt'], lambda tmp: wav2wt.save_wt_file(wt_data, tmp))
+
+    return count, paths
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# the modules import each other by their flat names (import matrices as M)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src' / 's2sc'))
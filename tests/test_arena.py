@@ -0,0 +1,92 @@
+import numpy as np
+
+import tuning as T
+import arena as A
+import wtmaker as WT
+
+SRATE = 48000
+FREQS = T.get_midi_freqs()
+
+
+def analyzed(freqs):
+    bases = {}
+    t = np.arange(SRATE // 4) / SRATE
+    audio_data = []
+    for f in freqs:
+        a = WT.Audio(SRATE, (20000 * np.sin(2 * np.pi * f * t) * np.exp(-1.5 * t)).astype(np.int16), f'{f:g}.wav')
+        a.analyze(bases, FREQS)
+        a.find_nearest_period_end()
+        audio_data.append(a)
+    return audio_data
+
+
+def test_ragged_array_growth():
+    ragged = A.RaggedArray(np.int32)
+    rows = [np.arange(n, dtype = np.int32) for n in (0, 3, 1, 17, 5)]
+    for row in rows:
+        ragged.append(row)
+
+    assert len(ragged) == len(rows)
+    assert ragged.lengths().tolist() == [0, 3, 1, 17, 5]
+    assert all(np.array_equal(ragged[i], row) for i, row in enumerate(rows))
+
+
+def test_view_matches_audio():
+    audio_data = analyzed([440.0, 110.0, 220.0])
+    arena = A.AudioArena(capacity = 16)
+    views = arena.extend(audio_data)
+
+    assert len(arena) == 3
+    assert arena.column('freq').tolist() == [a.freq for a in audio_data]
+    for a, v in zip(audio_data, views):
+        assert v.freq == a.freq
+        assert v.filename == a.filename
+        assert (v.start_min, v.start_index, v.end_index) == (a.start_min, a.start_index, a.end_index)
+        assert (v.zero_crossing_start(), v.zero_crossing_end()) == (a.zero_crossing_start(), a.zero_crossing_end())
+        assert np.array_equal(v.values, a.values)
+        assert np.allclose(v.create_frame(512, cycles = 3), a.create_frame(512, cycles = 3))
+
+    assert [v.filename for v in sorted(views, reverse = True)] == [a.filename for a in sorted(audio_data, reverse = True)]
+
+
+def test_view_writes_columns():
+    audio_data = analyzed([220.0, 440.0])
+    arena = A.AudioArena()
+    views = arena.extend(audio_data)
+
+    # the arrow buttons and set_freq move indices through the view
+    for a, v in zip(audio_data, views):
+        a.start_index_pos()
+        a.end_index_pos()
+        a.end_index_pos()
+        v.start_index_pos()
+        v.end_index_pos()
+        v.end_index_pos()
+        assert (v.start_index, v.end_index) == (a.start_index, a.end_index)
+
+    assert arena.column('start_index').tolist() == [a.start_index for a in audio_data]
+    assert arena[1].end_index == audio_data[1].end_index
+
+    views[0].freq = 123.5
+    assert arena.column('freq')[0] == 123.5
+    assert views[1].freq == audio_data[1].freq
+
+
+def test_columns_grow_past_initial_size():
+    audio_data = analyzed([220.0]) * 20
+    arena = A.AudioArena()
+    views = arena.extend(audio_data)
+
+    assert len(arena) == 20
+    assert views[-1].freq == audio_data[-1].freq
+    assert np.array_equal(views[-1].zero_crossing_starts, audio_data[-1].zero_crossing_starts)
+
+
+def test_view_analyze_sets_columns():
+    a = analyzed([220.0])[0]
+    view = A.AudioArena().append(a)
+    view.freq = 0
+    view.start_index = view.start_min
+
+    view.analyze({}, FREQS)
+    assert (view.freq, view.start_index) == (a.freq, a.start_index)
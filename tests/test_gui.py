@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+import tuning as T
+import session
+import wtmaker as WT
+import wtgui
+
+SRATE = 48000
+FREQS = T.get_midi_freqs()
+
+
+def saved_session(tmp_path):
+    """Session of one analyzed tone whose end marker was moved by hand"""
+    t = np.arange(SRATE // 2) / SRATE
+    a = WT.Audio(SRATE, (20000 * np.sin(2 * np.pi * 220.0 * t) * np.exp(-1.5 * t)).astype(np.int16))
+    a.analyze({}, FREQS)
+    a.find_nearest_period_end()
+    a.end_index_pos()
+    a.end_index_pos()
+
+    path = tmp_path / 'session.npz'
+    session.save_session(path, [a])
+    return path, a.start_index, a.end_index
+
+
+def test_marker_end_keeps_restored_end(tmp_path):
+    path, start_index, end_index = saved_session(tmp_path)
+    a = session.load_session(path)[0]
+
+    # only the marker state of the child is needed, no Tk widgets
+    child = wtgui.AudioAnalysisChild.__new__(wtgui.AudioAnalysisChild)
+    child.marker_start = None
+
+    assert child.marker_end(a) == a.zero_crossing_starts[end_index]
+    assert a.end_index == end_index
+
+    # moving the start afterwards still picks the nearest period end
+    a.start_index_pos()
+    child.marker_end(a)
+    assert a.end_index != end_index
+
+
+@pytest.mark.parametrize('raster', [False, True])
+def test_reopened_session_keeps_end(tmp_path, raster):
+    tk = pytest.importorskip('tkinter')
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        pytest.skip("no display")
+
+    path, start_index, end_index = saved_session(tmp_path)
+    wtgui.AudioAnalysisGUI.audio_data = session.load_session(path)
+    try:
+        child = wtgui.AudioAnalysisChild(root, 0, raster = raster)
+        child.canvas.config(width = 600)
+        root.update()
+        child.draw_waveform()
+
+        a = wtgui.AudioAnalysisGUI.audio_data[0]
+        assert (a.start_index, a.end_index) == (start_index, end_index)
+    finally:
+        root.destroy()
@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+import tuning as T
+import matrices as M
+import wtmaker as WT
+
+SRATE = 48000
+FREQS = T.get_midi_freqs()
+# A0 upward, every third note
+NOTES = FREQS[9::3]
+
+TIMBRES = {
+    'sine': [1],
+    'saw': [1 / k for k in range(1, 9)],
+    'strong_second': [0.4, 1, 0.3, 0.2],
+}
+
+
+def tone(freq, weights, seconds = 1):
+    t = np.arange(int(SRATE * seconds)) / SRATE
+    y = sum(w * np.sin(2 * np.pi * freq * h * t)
+            for h, w in enumerate(weights, start = 1) if freq * h < SRATE / 2)
+    return (20000 * y / np.max(np.abs(y)) * np.exp(-1.5 * t)).astype(np.int16)
+
+
+def same_note(detected, expected):
+    return abs(np.log2(detected / expected)) < 1 / 24
+
+
+@pytest.mark.parametrize('timbre', TIMBRES)
+def test_analyze_finds_fundamental(timbre):
+    bases = {}
+    wrong = []
+    for f in NOTES:
+        a = WT.Audio(SRATE, tone(f, TIMBRES[timbre]))
+        a.analyze(bases, FREQS)
+        if not same_note(a.freq, f):
+            wrong.append((round(f, 1), round(a.freq, 1)))
+    assert wrong == []
+
+
+@pytest.mark.parametrize('method', ['sum', 'product'])
+@pytest.mark.parametrize('timbre', TIMBRES)
+def test_get_harmonic_freq_finds_fundamental(timbre, method):
+    signals = np.stack([tone(f, TIMBRES[timbre]) for f in NOTES])
+    cmat = M.cmatrix(signals.shape[1], SRATE, FREQS)
+    amp = np.abs(signals @ cmat.T) / signals.shape[1]
+    picks = M.get_harmonic_freq(amp, FREQS, method = method)
+    wrong = [(round(f, 1), round(p, 1)) for f, p in zip(NOTES, picks) if not same_note(p, f)]
+    assert wrong == []
+
+
+def test_get_harmonic_freq_batch():
+    signals = np.stack([tone(f, TIMBRES['strong_second'], 0.25) for f in (110.0, 440.0, 1760.0)])
+    cmat = M.cmatrix(signals.shape[1], SRATE, FREQS)
+    amp = np.abs(signals @ cmat.T) / signals.shape[1]
+    assert np.allclose(M.get_harmonic_freq(amp, FREQS), [110.0, 440.0, 1760.0])
+
+
+def test_get_harmonic_freq_falls_back_to_argmax():
+    # a flat spectrum has no strict peaks, so no candidate qualifies
+    amp = np.ones(FREQS.shape)
+    assert M.get_harmonic_freq(amp, FREQS) == FREQS[0]
+
+
+def test_get_peaks_endpoints():
+    assert M.get_peaks(np.array([3, 1, 2, 1, 4])).tolist() == [1, 0, 1, 0, 1]
+    assert M.get_peaks(np.array([1, 2, 3])).tolist() == [0, 0, 1]
+
+
+@pytest.mark.parametrize('freq', [55.0, 220.0, 880.0])
+def test_trajectory_start_skips_attack(freq):
+    # a decaying note with a loud 100 ms noise burst on top of its attack
+    rng = np.random.default_rng(0)
+    burst = int(0.1 * SRATE)
+    y = tone(freq, TIMBRES['saw'], 2).astype(np.float64)
+    y[:burst] += 3 * 20000 * rng.standard_normal(burst) * np.linspace(1, 0, burst)
+    y = (20000 * y / np.max(np.abs(y))).astype(np.int16)
+
+    a = WT.Audio(SRATE, y)
+    a.analyze({}, FREQS)
+    assert same_note(a.freq, freq)
+    assert a.zero_crossing_start() > burst
+
+
+def test_create_frame_rejects_short_selection():
+    a = WT.Audio(SRATE, tone(440.0, TIMBRES['saw'], 0.25))
+    a.analyze({}, FREQS)
+    a.end_index = a.start_index
+    with pytest.raises(ValueError, match = "too short"):
+        a.create_frame(2048)
+
+
+def test_create_frame_of_silence():
+    a = WT.Audio(SRATE, tone(440.0, TIMBRES['saw'], 0.25))
+    a.analyze({}, FREQS)
+    a.find_nearest_period_end()
+    a.values[:] = 0
+    frame = a.create_frame(2048)
+    assert np.all(frame == 0)
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+import reduction as R
+
+FRAME_SIZE = 256
+
+
+def table():
+    """Three runs of similar frames: sines, squares, then saws, each with a slowly growing harmonic"""
+    t = np.arange(FRAME_SIZE) / FRAME_SIZE
+    frames = []
+    for shape in (np.sin, lambda x: np.sign(np.sin(x)), lambda x: (x / np.pi) % 2 - 1):
+        for k in range(6):
+            frames.append(shape(2 * np.pi * t) + 0.01 * k * np.sin(6 * np.pi * t))
+    return 30000 * np.array(frames) / np.max(np.abs(frames))
+
+
+@pytest.mark.parametrize('target', [1, 3, 7, 17])
+def test_adjacent_groups_are_contiguous(target):
+    spectra = R.frame_spectra(table())
+    groups = R.adjacent_groups(spectra, target)
+
+    assert len(groups) == target
+    assert groups[0][0] == 0
+    assert groups[-1][1] == spectra.shape[0]
+    for (_, end), (start, _) in zip(groups, groups[1:]):
+        assert end == start
+    assert all(end > start for start, end in groups)
+
+
+def test_adjacent_groups_follow_the_runs():
+    groups = R.adjacent_groups(R.frame_spectra(table()), 3)
+    assert [(int(s), int(e)) for s, e in groups] == [(0, 6), (6, 12), (12, 18)]
+
+
+@pytest.mark.parametrize('merge', ['representative', 'mean'])
+def test_reduce_frames(merge):
+    frames = table()
+    reduced = R.reduce_frames(frames, 3, merge)
+    assert reduced.shape == (3, FRAME_SIZE)
+
+    if merge == 'representative':
+        # every kept frame is one of the input cycles, in table order
+        rows = [int(np.flatnonzero((frames == r).all(axis = 1))[0]) for r in reduced]
+        assert [r // 6 for r in rows] == [0, 1, 2]
+    else:
+        # each average is rescaled to the loudest member of its run
+        runs = frames.reshape(3, 6, FRAME_SIZE)
+        assert np.allclose(np.max(np.abs(reduced), axis = 1), np.max(np.abs(runs), axis = (1, 2)))
+        assert np.allclose(reduced / np.max(np.abs(reduced), axis = 1, keepdims = True),
+                           runs.mean(axis = 1) / np.max(np.abs(runs.mean(axis = 1)), axis = 1, keepdims = True))
+
+
+def test_reduce_frames_keeps_small_tables():
+    frames = table()
+    assert R.reduce_frames(frames, None) is frames
+    assert R.reduce_frames(frames, frames.shape[0]) is frames
+
+
+def test_reduce_frames_unknown_merge():
+    with pytest.raises(ValueError):
+        R.reduce_frames(table(), 3, 'max')
@@ -0,0 +1,68 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pytest
+from scipy.io import wavfile
+
+import service
+
+
+@pytest.fixture(scope = 'module')
+def server():
+    s = service.Service(('127.0.0.1', 0), workers = 1)
+    thread = threading.Thread(target = s.serve_forever, daemon = True)
+    thread.start()
+    yield s
+    s.shutdown()
+    s.server_close()
+
+
+@pytest.fixture
+def directory(tmp_path):
+    t = np.arange(48000 // 4) / 48000
+    for f in (220.0, 440.0):
+        wavfile.write(tmp_path / f'{f:g}.wav', 48000, (20000 * np.sin(2 * np.pi * f * t)).astype(np.int16))
+    return tmp_path
+
+
+def post(server, path, body):
+    request = urllib.request.Request(f'http://127.0.0.1:{server.server_address[1]}{path}',
+                                     data = json.dumps(body).encode(), method = 'POST')
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+@pytest.mark.parametrize('options', [
+    {'max_frames': 'many'},
+    {'max_frames': 0},
+    {'max_frames': 2.5},
+    {'frame_size': None},
+    {'cycles': [2]},
+    {'formats': 'wt'},
+    {'formats': []},
+    {'formats': ['wav', 'mp3']},
+    {'name': 5},
+])
+def test_convert_rejects_bad_options(server, directory, options):
+    code, response = post(server, '/convert', {'directory': str(directory), 'output': str(directory / 'out'), **options})
+    assert code == 400
+    assert 'error' in response
+
+
+def test_convert_coerces_numeric_strings(server, directory):
+    code, response = post(server, '/convert', {
+        'directory': str(directory),
+        'output': str(directory / 'out'),
+        'frame_size': '256',
+        'max_frames': '1',
+        'formats': ['wt'],
+    })
+    assert code == 200
+    assert response['frames'] == 1
+    assert list(response['outputs']) == ['wt']
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+import tuning as T
+import arena as A
+import session
+import wtmaker as WT
+
+SRATE = 48000
+FREQS = T.get_midi_freqs()
+
+
+def analyzed(freqs):
+    bases = {}
+    t = np.arange(SRATE // 4) / SRATE
+    audio_data = []
+    for f in freqs:
+        a = WT.Audio(SRATE, (20000 * np.sin(2 * np.pi * f * t) * np.exp(-1.5 * t)).astype(np.int16), f'{f:g}.wav')
+        a.analyze(bases, FREQS)
+        a.find_nearest_period_end()
+        a.end_index_pos()
+        audio_data.append(a)
+    return audio_data
+
+
+def assert_same(loaded, original):
+    assert len(loaded) == len(original)
+    for a, b in zip(loaded, original):
+        assert np.array_equal(a.values, b.values)
+        assert np.array_equal(a.zero_crossing_starts, b.zero_crossing_starts)
+        assert np.array_equal(a.zero_crossing_ends, b.zero_crossing_ends)
+        assert (a.srate, a.freq, a.crossing_samples) == (b.srate, b.freq, b.crossing_samples)
+        assert (a.start_min, a.start_index, a.end_index) == (b.start_min, b.start_index, b.end_index)
+        assert str(a.filename) == str(b.filename)
+
+
+@pytest.mark.parametrize('views', [False, True])
+def test_round_trip(tmp_path, views):
+    audio_data = analyzed([110.0, 220.0, 440.0])
+    if views:
+        audio_data = A.AudioArena().extend(audio_data)
+
+    path = tmp_path / 'session.npz'
+    session.save_session(path, audio_data)
+    assert_same(session.load_session(path), audio_data)
+
+
+def test_values_are_memory_mapped(tmp_path):
+    audio_data = analyzed([220.0, 440.0])
+    path = tmp_path / 'session.npz'
+    session.save_session(path, audio_data)
+
+    values = session.mmap_member(path, 'values')
+    assert isinstance(values, np.memmap)
+    assert np.array_equal(values, np.concatenate([a.values for a in audio_data]))
+    assert isinstance(session.load_session(path)[0].values.base, np.memmap)
+
+
+def test_compressed_member_is_not_mapped(tmp_path):
+    path = tmp_path / 'compressed.npz'
+    np.savez_compressed(path, values = np.arange(10.0))
+    assert session.mmap_member(path, 'values') is None
+
+
+def test_empty_session(tmp_path):
+    path = tmp_path / 'empty.npz'
+    session.save_session(path, [])
+    assert session.load_session(path) == []
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+import tuning as T
+
+FREQS = np.array([27.5, 261.63, 440.0, 466.16, 4186.0])
+
+
+def test_note_index_scalar_matches_array():
+    indices = T.get_note_index(FREQS)
+    assert indices.shape == FREQS.shape
+    assert [T.get_note_index(f) for f in FREQS] == indices.tolist()
+    assert isinstance(T.get_note_index(440.0), int)
+
+
+def test_class_and_octave_scalar_matches_array():
+    indices = T.get_note_index(FREQS)
+    assert [T.get_class(i) for i in indices] == T.get_class(indices).tolist()
+    assert [T.get_octave(i) for i in indices] == T.get_octave(indices).tolist()
+    assert isinstance(T.get_class(57), str)
+    assert isinstance(T.get_octave(57), int)
+
+
+def test_class_label_scalar_matches_array():
+    labels = T.get_class_label(FREQS)
+    assert labels.tolist() == ['A0', 'C4', 'A4', 'As4', 'C8']
+    assert [T.get_class_label(f) for f in FREQS] == labels.tolist()
+
+
+def test_class_label_other_divisions():
+    with pytest.raises(ValueError):
+        T.get_class_label(880.0, semitone = 2**(1/24))
+
+    quarter_tones = np.array([c + q for c in T.CLASSES for q in ('', '+')])
+    labels = T.get_class_label(np.array([440.0, 452.89, 880.0]), semitone = 2**(1/24), classes = quarter_tones)
+    assert labels.tolist() == ['A4', 'A+4', 'A5']
+
+
+def test_scale_index_scalar_matches_array():
+    grid = T.get_midi_freqs()
+    indices = T.get_scale_index(FREQS, grid)
+    assert [T.get_scale_index(f, grid) for f in FREQS] == indices.tolist()
+    assert np.allclose(grid[indices], FREQS, rtol = 1e-3)
+
+
+def test_scale_freqs_equal_temperament_matches_midi():
+    assert np.allclose(T.get_scale_freqs(-57, 42), T.get_midi_freqs())
+
+
+def test_scale_freqs_accepts_list():
+    freqs = T.get_scale_freqs(-2, 3, 100, [1.0, 1.25, 1.5, 2.0])
+    assert np.allclose(freqs, [62.5, 75, 100, 125, 150, 200])
+    assert freqs is T.get_scale_freqs(-2, 3, 100, (1.0, 1.25, 1.5, 2.0))
+    assert not freqs.flags.writeable
+
+
+def test_read_scala(tmp_path):
+    path = tmp_path / 'just.scl'
+    path.write_text(
+        "! just.scl\n"
+        "!\n"
+        "5 limit just major triad\n"
+        " 4\n"
+        "!\n"
+        "5/4\n"
+        "701.955 cents\n"
+        "15/8\n"
+        "2\n"
+    )
+    scale = T.read_scala(path)
+    assert np.allclose(scale, [1.0, 1.25, 1.5, 1.875, 2.0], rtol = 1e-6)
+    assert np.allclose(T.get_scale_freqs(0, 4, 440, scale), [440, 550, 660, 825, 880], rtol = 1e-6)
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+import wav2wt
+
+
+def write_table(path, count, wave_size = 8):
+    frames = np.arange(count * wave_size, dtype = '<i2').reshape(count, wave_size)
+    with open(path, 'wb') as file:
+        file.write(wav2wt.WT_HEADER.pack(wav2wt.WT_MAGIC, wave_size, count, wav2wt.WT_INT16))
+        file.write(frames.tobytes())
+    return frames
+
+
+def test_slice_empty_selection_raises(tmp_path):
+    write_table(tmp_path / 'a.wt', 4)
+    with pytest.raises(ValueError, match = "no frames selected"):
+        wav2wt.slice_wt_file(tmp_path / 'a.wt', tmp_path / 'out.wt', 3, 3)
+    assert not (tmp_path / 'out.wt').exists()
+
+
+def test_merge_skips_empty_table(tmp_path):
+    frames = write_table(tmp_path / 'a.wt', 3)
+    write_table(tmp_path / 'empty.wt', 0)
+
+    count = wav2wt.merge_wt_files([tmp_path / 'empty.wt', tmp_path / 'a.wt'], tmp_path / 'out.wt')
+    merged, _ = wav2wt.read_wt_file(tmp_path / 'out.wt')
+    assert count == 3
+    assert np.array_equal(merged, frames)